@@ -0,0 +1,120 @@
+"""
+Lot consolidation benchmark.
+
+Simulates a long drawdown for many symbols with always_on and a 1% buy grid, then
+compares lot count, lots.json size and trigger scan time with and without consolidation.
+
+    python benchmarks/bench_consolidation.py --symbols 2000 --steps 300
+
+Merged lots may only span bucket_percent (see bot.consolidate_lots), so consolidation
+only pays off when the buy grid is finer than the bucket, e.g. --buy-drop-percent 0.25.
+"""
+import os
+import sys
+import json
+import time
+import random
+import logging
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bot import ActiveLotsManager, check_grid_triggers, consolidate_lots, get_sell_quantity
+
+CONFIG = {
+    "buy_drop_percent": 1.0,
+    "sell_rise_percent": 2.0,
+    "always_on": True,
+    "always_on_amount": 1.0,
+    "trade_amount": 10.0,
+    "profit_mode": "TAKE"
+}
+
+def price_paths(num_symbols, steps, seed):
+    rng = random.Random(seed)
+    paths = []
+    for _ in range(num_symbols):
+        price = rng.uniform(5, 500)
+        path = []
+        for _ in range(steps):
+            # Downward drift so the grid keeps buying
+            price *= 1 + rng.gauss(-0.003, 0.01)
+            path.append(price)
+        paths.append(path)
+    return paths
+
+def simulate(paths, consolidation):
+    manager = ActiveLotsManager(filename=None, consolidation=consolidation)
+    symbols = [f"S{i:05d}" for i in range(len(paths))]
+    scan_time = 0.0
+    for step in range(len(paths[0])):
+        for symbol, path in zip(symbols, paths):
+            price = path[step]
+            start = time.perf_counter()
+            actions = check_grid_triggers(symbol, price, manager, CONFIG)
+            scan_time += time.perf_counter() - start
+            for action in sorted((a for a in actions if a[0] == 'SELL'), key=lambda a: a[1], reverse=True):
+                manager.remove_lot(symbol, action[1])
+            for _, buy_price, amount in (a for a in actions if a[0] == 'BUY'):
+                manager.add_lot(symbol, buy_price, amount / buy_price)
+    return manager, scan_time
+
+def check_equivalence(trials, seed, bucket_percent):
+    """
+    Samples consolidated lots against their parts. Returns (worst relative sell-quantity
+    difference at prices where every part sells, worst relative distance between the
+    merged sell trigger and any part's own trigger).
+    """
+    rng = random.Random(seed)
+    rise = 1 + CONFIG['sell_rise_percent'] / 100
+    worst = 0.0
+    drift = 0.0
+    for _ in range(trials):
+        base = rng.uniform(1, 1000)
+        parts = [{'buy_price': base * (1 + rng.uniform(0, 2 * bucket_percent) / 100),
+                  'quantity': rng.uniform(0.001, 5), 'timestamp': 0.0} for _ in range(rng.randint(2, 10))]
+        for merged in consolidate_lots(parts, bucket_percent=bucket_percent, max_lots=1):
+            members = [lot for lot in parts if merged.get('min_buy_price', 0) <= lot['buy_price'] <= merged.get('max_buy_price', 0)]
+            if len(members) < 2:
+                continue
+            drift = max(drift, max(abs(merged['buy_price'] / lot['buy_price'] - 1) for lot in members))
+
+            # Every part past its trigger: same shares sold
+            price = merged['max_buy_price'] * rise * rng.uniform(1, 1.5)
+            for mode in ('TAKE', 'LEAVE'):
+                together = sum(get_sell_quantity(lot, price, mode) for lot in members)
+                worst = max(worst, abs(get_sell_quantity(merged, price, mode) - together) / together)
+    return worst, drift
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--symbols", type=int, default=2000)
+    parser.add_argument("--steps", type=int, default=300)
+    parser.add_argument("--buy-drop-percent", type=float, default=CONFIG['buy_drop_percent'])
+    parser.add_argument("--bucket-percent", type=float, default=0.5)
+    parser.add_argument("--max-lots", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+    CONFIG['buy_drop_percent'] = args.buy_drop_percent
+    paths = price_paths(args.symbols, args.steps, args.seed)
+
+    policies = [
+        ("off", None),
+        ("bucket", {"enabled": True, "bucket_percent": args.bucket_percent}),
+        ("bucket+cap", {"enabled": True, "bucket_percent": args.bucket_percent, "max_lots_per_symbol": args.max_lots})
+    ]
+    print(f"{'policy':12} {'lots':>10} {'max/sym':>8} {'json bytes':>12} {'scan s':>8} {'basis':>14}")
+    for name, policy in policies:
+        manager, scan_time = simulate(paths, policy)
+        max_per_symbol = max((len(lots) for lots in manager.lots.values()), default=0)
+        size = len(json.dumps(manager.lots, indent=4))
+        print(f"{name:12} {manager.total_lots:>10} {max_per_symbol:>8} {size:>12} {scan_time:>8.3f} {manager.total_basis:>14.2f}")
+
+    worst, drift = check_equivalence(10000, args.seed, args.bucket_percent)
+    print(f"Max relative sell-quantity difference once every part sells: {worst:.2e}")
+    print(f"Max sell-trigger drift vs a part's own trigger: {drift:.3%} (bound {args.bucket_percent:.3f}%)")
+
+if __name__ == "__main__":
+    main()
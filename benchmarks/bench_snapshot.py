@@ -0,0 +1,86 @@
+"""
+Startup benchmark: JSON vs binary snapshot for lots and config state.
+
+    python benchmarks/bench_snapshot.py --symbols 6000 --lots-per-symbol 5
+"""
+import os
+import sys
+import json
+import time
+import random
+import logging
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import snapshot
+from bot import ActiveLotsManager
+
+def best_of(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times) * 1000
+
+def synthetic_state(num_symbols, lots_per_symbol, seed):
+    rng = random.Random(seed)
+    symbols = [f"S{i:05d}" for i in range(num_symbols)]
+    lots = {
+        symbol: [
+            {'buy_price': rng.uniform(1, 500), 'quantity': rng.uniform(0.001, 1), 'timestamp': time.time()}
+            for _ in range(lots_per_symbol)
+        ]
+        for symbol in symbols
+    }
+    config = {"symbols": symbols, "buy_drop_percent": 1.0, "sell_rise_percent": 2.0, "currency": "USD"}
+    return lots, config
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--symbols", type=int, default=6000)
+    parser.add_argument("--lots-per-symbol", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+    lots, config = synthetic_state(args.symbols, args.lots_per_symbol, args.seed)
+    probe = random.Random(args.seed).choice(list(lots))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        lots_json = os.path.join(tmp, "lots.json")
+        lots_snap = os.path.join(tmp, "lots.snap")
+        config_json = os.path.join(tmp, "config.json")
+        config_snap = os.path.join(tmp, "config.snap")
+        with open(lots_json, 'w') as f:
+            json.dump(lots, f, indent=4)
+        with open(config_json, 'w') as f:
+            json.dump(config, f, indent=4)
+        snapshot.convert(lots_json, lots_snap)
+        snapshot.convert(config_json, config_snap)
+
+        def load_json(path):
+            with open(path) as f:
+                return json.load(f)
+
+        rows = [
+            ("lots: json.load", best_of(lambda: load_json(lots_json), args.repeat)),
+            ("lots: snapshot full decode", best_of(lambda: snapshot.LotsSnapshot(lots_snap).to_dict(), args.repeat)),
+            ("lots: ActiveLotsManager (json)", best_of(lambda: ActiveLotsManager(lots_json), args.repeat)),
+            ("lots: ActiveLotsManager (snapshot)", best_of(lambda: ActiveLotsManager(lots_snap), args.repeat)),
+            ("lots: single symbol (json)", best_of(lambda: load_json(lots_json)[probe], args.repeat)),
+            ("lots: single symbol (snapshot)", best_of(lambda: snapshot.LotsSnapshot(lots_snap).get_lots(probe), args.repeat)),
+            ("config: json.load", best_of(lambda: load_json(config_json), args.repeat)),
+            ("config: snapshot", best_of(lambda: snapshot.read_config_snapshot(config_snap), args.repeat)),
+        ]
+        print(f"{args.symbols} symbols x {args.lots_per_symbol} lots | "
+              f"lots.json {os.path.getsize(lots_json)} B, lots.snap {os.path.getsize(lots_snap)} B | "
+              f"config.json {os.path.getsize(config_json)} B, config.snap {os.path.getsize(config_snap)} B")
+        for name, ms in rows:
+            print(f"{name:38} {ms:9.3f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+End-to-end load test against a local fake_alpaca.py server.
+
+Bot loop throughput (runs TradingBot.run_iteration against CONFIG_FILE, lots kept in a temp file):
+    ALPACA_BASE_URL=http://127.0.0.1:5001 ALPACA_DATA_URL=http://127.0.0.1:5001 \\
+        python benchmarks/load_test.py bot --iterations 5
+
+Dashboard tail latency (web_ui started with the same ALPACA_* variables):
+    python benchmarks/load_test.py http --url http://127.0.0.1:5000/api/data --requests 500 --concurrency 16
+"""
+import os
+import sys
+import time
+import logging
+import argparse
+import tempfile
+import statistics
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100.0 * len(ordered)) - 1))
+    return ordered[index]
+
+def report(label, latencies, elapsed, errors=0):
+    ms = [t * 1000 for t in latencies]
+    print(f"{label}: {len(ms)} ok, {errors} errors in {elapsed:.2f}s ({len(ms) / elapsed:.1f}/s)")
+    if ms:
+        print(f"  mean {statistics.mean(ms):.1f} ms | p50 {percentile(ms, 50):.1f} | p90 {percentile(ms, 90):.1f} | "
+              f"p99 {percentile(ms, 99):.1f} | max {max(ms):.1f}")
+
+def run_bot(args):
+    os.environ.setdefault("ALPACA_API_KEY", "fake")
+    os.environ.setdefault("ALPACA_API_SECRET", "fake")
+    os.environ.setdefault("TRADING_MODE", "DRY")
+    tmp = tempfile.mkdtemp()
+    os.environ.setdefault("LOTS_FILE", os.path.join(tmp, "lots.json"))
+
+    from bot import TradingBot, load_config
+    logging.getLogger().setLevel(logging.WARNING)
+
+    bot = TradingBot(load_config())
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(args.iterations):
+        t0 = time.perf_counter()
+        bot.run_iteration()
+        latencies.append(time.perf_counter() - t0)
+    elapsed = time.perf_counter() - start
+    report(f"run_iteration over {len(bot.config['symbols'])} symbols", latencies, elapsed)
+    print(f"  lots tracked: {bot.manager.total_lots}")
+
+def run_http(args):
+    import requests
+
+    session_per_thread = {}
+
+    def fetch(_):
+        import threading
+        session = session_per_thread.setdefault(threading.get_ident(), requests.Session())
+        t0 = time.perf_counter()
+        try:
+            response = session.get(args.url, timeout=args.timeout)
+            ok = response.status_code == 200
+        except requests.RequestException:
+            ok = False
+        return ok, time.perf_counter() - t0
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        results = list(pool.map(fetch, range(args.requests)))
+    elapsed = time.perf_counter() - start
+    latencies = [t for ok, t in results if ok]
+    report(f"GET {args.url} x{args.concurrency}", latencies, elapsed, errors=len(results) - len(latencies))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="mode", required=True)
+    bot_parser = sub.add_parser("bot", help="time TradingBot.run_iteration")
+    bot_parser.add_argument("--iterations", type=int, default=3)
+    http_parser = sub.add_parser("http", help="hammer an HTTP endpoint")
+    http_parser.add_argument("--url", default="http://127.0.0.1:5000/api/data")
+    http_parser.add_argument("--requests", type=int, default=200)
+    http_parser.add_argument("--concurrency", type=int, default=8)
+    http_parser.add_argument("--timeout", type=float, default=30.0)
+    args = parser.parse_args()
+
+    if args.mode == "bot":
+        run_bot(args)
+    else:
+        run_http(args)
+
+if __name__ == "__main__":
+    main()
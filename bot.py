@@ -1,18 +1,50 @@
 import os
 import time
 import logging
+import logging.handlers
 import json
+import math
+import operator
+import queue
+import random
+import atexit
+import threading
 from dotenv import load_dotenv
 from alpaca.trading.client import TradingClient
 from alpaca.trading.requests import MarketOrderRequest
 from alpaca.trading.enums import OrderSide, TimeInForce, OrderStatus, AssetStatus, AssetClass
 from alpaca.data.historical import StockHistoricalDataClient
 from alpaca.data.requests import StockLatestQuoteRequest
+import snapshot
+import profiling
+import history
 
 # Load environment variables
 load_dotenv()
 
 # Configure logging
+def setup_logging(level=logging.INFO):
+    """
+    Routes all log records through a queue so the stream I/O happens on a
+    background listener thread instead of the trading loop.
+    """
+    log_queue = queue.SimpleQueue()
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+
+    root = logging.getLogger()
+    root.setLevel(level)
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+
+    listener = logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
+
+# Plain synchronous logging for importers (web_ui, benchmarks). The listener thread in
+# setup_logging() would not survive a fork, so only long-lived processes call it themselves.
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(levelname)s - %(message)s'
@@ -20,9 +52,26 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 # =============== CONFIGURATION ===============
+# Either file may be a binary snapshot (*.snap, see snapshot.py) instead of JSON
+CONFIG_FILE = os.getenv("CONFIG_FILE", "config.json")
+LOTS_FILE = os.getenv("LOTS_FILE", "lots.json")
+
+def file_signature(path):
+    """
+    Cheap change detector for state files; None if the file is missing.
+    """
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    # Atomic replacement always changes the inode, even within one mtime tick
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
+
 def load_config():
     try:
-        with open('config.json', 'r') as f:
+        if snapshot.is_snapshot(CONFIG_FILE):
+            return snapshot.read_config_snapshot(CONFIG_FILE)
+        with open(CONFIG_FILE, 'r') as f:
             return json.load(f)
     except:
         return {
@@ -34,20 +83,121 @@ def load_config():
             "check_interval": 60,
             "profit_mode": "TAKE",
             "always_on": True,
-            "always_on_amount": 1.0
+            "always_on_amount": 1.0,
+            "status_mode": "full",
+            "status_near_percent": 0.5,
+            "status_sample_rate": 0.0,
+            # Merges lots bought within bucket_percent of each other (see consolidate_lots).
+            # A merged lot's sell trigger moves by at most bucket_percent from any part's own;
+            # bucket_percent is capped at MAX_BUCKET_FRACTION of sell_rise_percent.
+            "consolidation": {"enabled": False, "bucket_percent": 0.5, "max_lots_per_symbol": 20},
+            "reconcile": {"enabled": False, "interval": 900, "tolerance_percent": 1.0, "mode": "flag"}
         }
 
 CONFIG = load_config()
 CONFIG["dry_run"] = os.getenv("TRADING_MODE", "DRY") == "DRY"
 
+# Widest consolidation bucket, as a fraction of sell_rise_percent
+MAX_BUCKET_FRACTION = 0.25
+
+def lot_min_buy_price(lot):
+    """
+    Lowest fill price behind a lot; differs from buy_price only for merged lots.
+    """
+    return lot.get('min_buy_price', lot['buy_price'])
+
+def lot_max_buy_price(lot):
+    """
+    Highest fill price behind a lot; differs from buy_price only for merged lots.
+    """
+    return lot.get('max_buy_price', lot['buy_price'])
+
+def price_span(lots):
+    """
+    Relative distance between the cheapest and dearest fill behind lots (0.01 = 1%).
+    """
+    return max(lot_max_buy_price(lot) for lot in lots) / min(lot_min_buy_price(lot) for lot in lots) - 1.0
+
+def merge_lots(lots):
+    """
+    Merges lots into a single quantity-weighted lot.
+
+    Quantity and cost basis are preserved exactly. The lowest and highest part prices
+    are kept as min_buy_price and max_buy_price: the buy grid measures drops from the
+    real lowest fill, and consolidate_lots bounds how far apart merged fills can be.
+
+    This is not an exact merge. Sell quantity matches the parts only at prices where
+    every part would sell (p >= max(b_i) * (1 + s)):
+      TAKE:  Q = sum(q_i)
+      LEAVE: min(B / p, Q) = sum(min(q_i * b_i / p, q_i))
+    The merged lot triggers at avg * (1 + s), which is within price_span(lots) of
+    each part's own trigger b_i * (1 + s): later than the cheapest part, earlier
+    than the dearest.
+    """
+    quantity = sum(lot['quantity'] for lot in lots)
+    cost_basis = sum(lot['quantity'] * lot['buy_price'] for lot in lots)
+    return {
+        'buy_price': cost_basis / quantity,
+        'quantity': quantity,
+        'timestamp': min(lot['timestamp'] for lot in lots),
+        'min_buy_price': min(lot_min_buy_price(lot) for lot in lots),
+        'max_buy_price': max(lot_max_buy_price(lot) for lot in lots)
+    }
+
+def consolidate_lots(lots, bucket_percent=0.0, max_lots=None):
+    """
+    Merges lots whose buy prices share a geometric price bucket of width
+    bucket_percent, then merges the closest neighbours while more than max_lots remain.
+
+    No merge produces a lot whose fills span more than bucket_percent, so the sell
+    trigger drift described in merge_lots stays within bucket_percent. That makes
+    max_lots best-effort: merging stops once the closest pair would span more.
+    """
+    if not bucket_percent or bucket_percent <= 0:
+        return list(lots)
+    limit = bucket_percent / 100.0
+    # Tolerance for fills that sit exactly one bucket apart
+    within_limit = lambda group: price_span(group) <= limit * (1 + 1e-9)
+
+    width = math.log1p(limit)
+    buckets = {}
+    for lot in lots:
+        buckets.setdefault(math.floor(math.log(lot['buy_price']) / width), []).append(lot)
+    merged = []
+    for group in buckets.values():
+        # Earlier merges can reach past their bucket, so the span is checked again
+        if len(group) > 1 and within_limit(group):
+            merged.append(merge_lots(group))
+        else:
+            merged.extend(group)
+    lots = merged
+
+    if max_lots and len(lots) > max_lots:
+        lots.sort(key=lambda lot: lot['buy_price'])
+        while len(lots) > max_lots:
+            # Merge the adjacent pair with the smallest combined span
+            i = min(range(len(lots) - 1), key=lambda k: price_span(lots[k:k + 2]))
+            if not within_limit(lots[i:i + 2]):
+                break
+            lots[i:i + 2] = [merge_lots(lots[i:i + 2])]
+
+    lots.sort(key=lambda lot: lot['timestamp'])
+    return lots
+
 class ActiveLotsManager:
-    def __init__(self, filename="lots.json"):
+    def __init__(self, filename=LOTS_FILE, consolidation=None):
+        # filename=None keeps lots in memory only (simulations, benchmarks)
         self.filename = filename
+        self.consolidation = consolidation
         self.lots = self._load_lots()
+        self.modified_at = {}
+        self._rebuild_aggregates()
 
     def _load_lots(self):
-        if os.path.exists(self.filename):
+        if self.filename and os.path.exists(self.filename):
             try:
+                if snapshot.is_snapshot(self.filename):
+                    return snapshot.read_lots(self.filename)
                 with open(self.filename, 'r') as f:
                     return json.load(f)
             except Exception as e:
@@ -55,41 +205,170 @@ class ActiveLotsManager:
         return {}
 
     def _save_lots(self):
+        if not self.filename:
+            return
         try:
-            with open(self.filename, 'w') as f:
-                json.dump(self.lots, f, indent=4)
+            if snapshot.is_snapshot(self.filename):
+                snapshot.write_lots_snapshot(self.lots, self.filename)
+                return
+            snapshot.atomic_write(self.filename, [json.dumps(self.lots, indent=4).encode()])
         except Exception as e:
             logger.error(f"Error saving lots: {e}")
 
+    def _rebuild_aggregates(self):
+        """
+        Recomputes per-symbol and portfolio aggregates from scratch.
+        After this, add_lot/remove_lot keep them up to date incrementally.
+        """
+        self.symbol_stats = {}
+        self.total_basis = 0.0
+        self.total_lots = 0
+        # Snapshot-backed lots carry their aggregates, so no lot needs decoding here
+        stored_stats = getattr(self.lots, 'stored_stats', None)
+        for symbol in self.lots:
+            stats = stored_stats(symbol) if stored_stats else None
+            if stats is None:
+                self._rebuild_symbol_stats(symbol)
+            elif stats['lot_count']:
+                self.symbol_stats[symbol] = stats
+                self.total_basis += stats['cost_basis']
+                self.total_lots += stats['lot_count']
+
+    def _rebuild_symbol_stats(self, symbol):
+        old = self.symbol_stats.pop(symbol, None)
+        if old:
+            self.total_basis -= old['cost_basis']
+            self.total_lots -= old['lot_count']
+
+        lots = self.lots.get(symbol)
+        if not lots:
+            return
+        stats = {
+            'quantity': sum(lot['quantity'] for lot in lots),
+            'cost_basis': sum(lot['quantity'] * lot['buy_price'] for lot in lots),
+            'lot_count': len(lots),
+            'lowest_buy': min(lot_min_buy_price(lot) for lot in lots)
+        }
+        self.symbol_stats[symbol] = stats
+        self.total_basis += stats['cost_basis']
+        self.total_lots += stats['lot_count']
+
+    def _stats_add(self, symbol, lot):
+        stats = self.symbol_stats.get(symbol)
+        if stats is None:
+            stats = {'quantity': 0.0, 'cost_basis': 0.0, 'lot_count': 0, 'lowest_buy': lot_min_buy_price(lot)}
+            self.symbol_stats[symbol] = stats
+        basis = lot['quantity'] * lot['buy_price']
+        stats['quantity'] += lot['quantity']
+        stats['cost_basis'] += basis
+        stats['lot_count'] += 1
+        stats['lowest_buy'] = min(stats['lowest_buy'], lot_min_buy_price(lot))
+        self.total_basis += basis
+        self.total_lots += 1
+
+    def _stats_remove(self, symbol, lot):
+        if symbol not in self.lots:
+            # Last lot gone - drop the entry so float drift does not accumulate
+            self._rebuild_symbol_stats(symbol)
+            return
+        stats = self.symbol_stats[symbol]
+        basis = lot['quantity'] * lot['buy_price']
+        stats['quantity'] -= lot['quantity']
+        stats['cost_basis'] -= basis
+        stats['lot_count'] -= 1
+        self.total_basis -= basis
+        self.total_lots -= 1
+        if lot_min_buy_price(lot) <= stats['lowest_buy']:
+            # Only rescan this symbol's lots when its minimum was removed
+            stats['lowest_buy'] = min(lot_min_buy_price(l) for l in self.lots[symbol])
+
     def add_lot(self, symbol, buy_price, quantity):
         if symbol not in self.lots:
             self.lots[symbol] = []
-        self.lots[symbol].append({
+        lot = {
             'buy_price': buy_price,
             'quantity': quantity,
             'timestamp': time.time()
-        })
+        }
+        self.lots[symbol].append(lot)
+        self.modified_at[symbol] = lot['timestamp']
+        self._stats_add(symbol, lot)
+        if self.consolidation and self.consolidation.get('enabled'):
+            self._consolidate_symbol(symbol)
         self._save_lots()
         logger.info(f"SUCCESS: Added lot for {symbol}: {quantity:.6f} shares @ {buy_price:.2f}")
 
+    def _consolidate_symbol(self, symbol):
+        lots = self.lots[symbol]
+        merged = consolidate_lots(
+            lots,
+            bucket_percent=self.consolidation.get('bucket_percent', 0.0),
+            max_lots=self.consolidation.get('max_lots_per_symbol')
+        )
+        if len(merged) < len(lots):
+            self.lots[symbol] = merged
+            self._rebuild_symbol_stats(symbol)
+            logger.info(f"CONSOLIDATED: {symbol} lots {len(lots)} -> {len(merged)}")
+
     def remove_lot(self, symbol, lot_index):
         if symbol in self.lots and 0 <= lot_index < len(self.lots[symbol]):
             lot = self.lots[symbol].pop(lot_index)
             if not self.lots[symbol]:
                 del self.lots[symbol]
+            self.modified_at[symbol] = time.time()
+            self._stats_remove(symbol, lot)
             self._save_lots()
             logger.info(f"SUCCESS: Removed lot for {symbol}: {lot['quantity']:.6f} shares @ {lot['buy_price']:.2f}")
             return True
         return False
 
+    def clear(self):
+        self.lots = {}
+        self._rebuild_aggregates()
+        self._save_lots()
+
+    def replace_lots(self, updates):
+        """
+        Replaces the lots of several symbols at once ([] drops the symbol) and saves once.
+        """
+        now = time.time()
+        for symbol, lots in updates.items():
+            if lots:
+                self.lots[symbol] = lots
+            elif symbol in self.lots:
+                del self.lots[symbol]
+            self.modified_at[symbol] = now
+            self._rebuild_symbol_stats(symbol)
+        if updates:
+            self._save_lots()
+
     def get_lots(self, symbol):
         return self.lots.get(symbol, [])
 
+    def get_lot_count(self, symbol):
+        stats = self.symbol_stats.get(symbol)
+        return stats['lot_count'] if stats else 0
+
     def get_lowest_buy_price(self, symbol):
-        lots = self.get_lots(symbol)
-        if not lots:
+        stats = self.symbol_stats.get(symbol)
+        if not stats:
             return None
-        return min(lot['buy_price'] for lot in lots)
+        return stats['lowest_buy']
+
+    def get_allocation(self):
+        """
+        Returns cost basis per symbol.
+        """
+        return {symbol: stats['cost_basis'] for symbol, stats in self.symbol_stats.items()}
+
+    def get_market_value(self, prices):
+        """
+        Portfolio market value as a single dot product of held quantities and prices.
+        Symbols without a price count as zero.
+        """
+        quantities = [stats['quantity'] for stats in self.symbol_stats.values()]
+        symbol_prices = [prices.get(symbol, 0) for symbol in self.symbol_stats]
+        return sum(map(operator.mul, quantities, symbol_prices))
 
 class AlpacaAPI:
     def __init__(self):
@@ -97,8 +376,12 @@ class AlpacaAPI:
         api_secret = os.getenv("ALPACA_API_SECRET")
         paper = os.getenv("TRADING_MODE", "PAPER") == "PAPER"
         
-        self.trading_client = TradingClient(api_key, api_secret, paper=paper)
-        self.data_client = StockHistoricalDataClient(api_key, api_secret)
+        # Optional overrides, e.g. to point at a local fake_alpaca.py server
+        base_url = os.getenv("ALPACA_BASE_URL")
+        data_url = os.getenv("ALPACA_DATA_URL")
+        
+        self.trading_client = TradingClient(api_key, api_secret, paper=paper, url_override=base_url)
+        self.data_client = StockHistoricalDataClient(api_key, api_secret, url_override=data_url)
         self.asset_info = {}
 
     def is_market_open(self):
@@ -161,6 +444,21 @@ class AlpacaAPI:
             logger.error(f"Error fetching multiple prices: {e}")
             return {}
 
+    def get_multiple_trade_prices(self, symbols):
+        """
+        Fetches latest trade prices for multiple symbols in one go, e.g. when quotes
+        have no ask after hours.
+        """
+        if not symbols:
+            return {}
+        try:
+            from alpaca.data.requests import StockLatestTradeRequest
+            trades = self.data_client.get_stock_latest_trade(StockLatestTradeRequest(symbol_or_symbols=symbols))
+            return {s: float(t.price or 0) for s, t in trades.items()}
+        except Exception as e:
+            logger.error(f"Error fetching multiple trade prices: {e}")
+            return {}
+
     def get_account_equity(self):
         """
         Fetches the total account equity.
@@ -172,6 +470,45 @@ class AlpacaAPI:
             logger.error(f"Error fetching account equity: {e}")
             return None
 
+    def get_account_balances(self):
+        """
+        Fetches (equity, cash) with a single account call. (None, None) on error.
+        """
+        try:
+            account = self.trading_client.get_account()
+            return float(account.equity), float(account.cash)
+        except Exception as e:
+            logger.error(f"Error fetching account balances: {e}")
+            return None, None
+
+    def get_all_positions(self):
+        """
+        Fetches all open positions as {symbol: {'qty', 'avg_entry_price'}}. None on error.
+        """
+        try:
+            positions = self.trading_client.get_all_positions()
+            return {p.symbol: {'qty': float(p.qty), 'avg_entry_price': float(p.avg_entry_price)} for p in positions}
+        except Exception as e:
+            logger.error(f"Error fetching positions: {e}")
+            return None
+
+    def get_open_order_symbols(self, limit=500):
+        """
+        Symbols with open (unfilled) orders. None on error, or when a full page
+        (limit is Alpaca's maximum) means the list may be truncated.
+        """
+        try:
+            from alpaca.trading.requests import GetOrdersRequest
+            from alpaca.trading.enums import QueryOrderStatus
+            orders = self.trading_client.get_orders(GetOrdersRequest(status=QueryOrderStatus.OPEN, limit=limit))
+            if len(orders) >= limit:
+                logger.warning(f"Open orders hit the {limit} order page limit and may be truncated")
+                return None
+            return {o.symbol for o in orders}
+        except Exception as e:
+            logger.error(f"Error fetching open orders: {e}")
+            return None
+
     def get_account_cash(self):
         """
         Fetches the account cash balance.
@@ -291,11 +628,163 @@ def check_grid_triggers(symbol, current_price, manager, config):
             
     return actions
 
+def get_sell_quantity(lot, price, profit_mode):
+    """
+    Shares to sell when a lot hits its sell trigger.
+    TAKE sells the whole lot, LEAVE sells only the cost basis worth of shares.
+    """
+    if profit_mode == 'LEAVE':
+        return min(lot['buy_price'] * lot['quantity'] / price, lot['quantity'])
+    return lot['quantity']
+
+def reconcile_lots(manager, positions, open_order_symbols=(), since=None, tolerance_percent=1.0,
+                   correct=False, profit_mode='TAKE'):
+    """
+    Diffs per-symbol lot quantities against broker positions in O(symbols).
+
+    Symbols with open orders, or whose lots changed after `since` (when the
+    positions were fetched), are skipped. With correct=True, tracked symbols are
+    fixed by scaling their lots to the broker quantity (keeping buy prices), or
+    dropped when the broker holds nothing. Untracked broker positions are only
+    flagged. Under profit_mode LEAVE, shares the broker holds beyond the lots are
+    the profit LEAVE keeps on purpose, so only shortfalls count and lots are
+    never scaled up. Returns (updates for manager.replace_lots, list of mismatch reports).
+    """
+    updates = {}
+    mismatches = []
+    for symbol in set(manager.symbol_stats).union(positions):
+        if symbol in open_order_symbols:
+            continue
+        if since is not None and manager.modified_at.get(symbol, 0) > since:
+            continue
+        stats = manager.symbol_stats.get(symbol)
+        local_qty = stats['quantity'] if stats else 0.0
+        broker_qty = positions.get(symbol, {}).get('qty', 0.0)
+        if abs(local_qty - broker_qty) <= max(local_qty, broker_qty) * tolerance_percent / 100.0:
+            continue
+        if profit_mode == 'LEAVE' and broker_qty > local_qty:
+            # Untracked profit shares left behind by LEAVE sells
+            continue
+
+        if not local_qty:
+            action = "untracked"
+        elif not broker_qty:
+            action = "dropped" if correct else "flagged"
+            if correct:
+                updates[symbol] = []
+        else:
+            action = "scaled" if correct else "flagged"
+            if correct:
+                factor = broker_qty / local_qty
+                updates[symbol] = [dict(lot, quantity=lot['quantity'] * factor) for lot in manager.get_lots(symbol)]
+        mismatches.append((symbol, local_qty, broker_qty, action))
+    return updates, mismatches
+
+class PositionFetcher(threading.Thread):
+    """
+    Background thread that periodically pulls all broker positions off the trading
+    hot path. Results are queued and applied at the start of the next bot iteration.
+    """
+    def __init__(self, get_settings, api=None, poll_seconds=5):
+        super().__init__(daemon=True, name="position-fetcher")
+        self.get_settings = get_settings
+        self.results = queue.SimpleQueue()
+        self.api = api or AlpacaAPI()
+        self.poll_seconds = poll_seconds
+        self._last_run = time.time()
+
+    def run(self):
+        while True:
+            time.sleep(self.poll_seconds)
+            self.tick()
+
+    def tick(self, now=None):
+        """
+        Fetches positions once the interval has passed. Settings are re-read on every
+        tick, so enabling, disabling or changing the interval applies within poll_seconds.
+        Returns True when a fetch was attempted.
+        """
+        now = now or time.time()
+        settings = self.get_settings()
+        if now - self._last_run < settings.get('interval', 900):
+            return False
+        if not settings.get('enabled') or os.getenv("TRADING_MODE", "DRY") == "DRY":
+            return False
+        self._last_run = now
+        # Orders queue while closed, so positions lag the lots until the open
+        if not self.api.is_market_open():
+            return False
+        fetched_at = time.time()
+        open_symbols = self.api.get_open_order_symbols()
+        positions = self.api.get_all_positions()
+        if positions is not None and open_symbols is not None:
+            self.results.put((fetched_at, positions, open_symbols))
+        return True
+
+class SymbolBatchPlan:
+    """
+    Price-fetch batches for the configured symbols. When the symbol list changes,
+    only the added and removed symbols are moved instead of re-slicing the whole list.
+    """
+    def __init__(self, batch_size=200):
+        self.batch_size = batch_size
+        self.batches = []
+        self._batch_of = {}
+        self._symbols = None
+
+    def update(self, symbols):
+        """
+        Applies the difference to the given symbol list. Returns (added, removed).
+        """
+        if symbols == self._symbols:
+            return [], []
+        wanted = set(symbols)
+        removed = [s for s in self._batch_of if s not in wanted]
+        added = [s for s in dict.fromkeys(symbols) if s not in self._batch_of]
+
+        for symbol in removed:
+            self.batches[self._batch_of.pop(symbol)].remove(symbol)
+        for symbol in added:
+            if not self.batches or len(self.batches[-1]) >= self.batch_size:
+                self.batches.append([])
+            self.batches[-1].append(symbol)
+            self._batch_of[symbol] = len(self.batches) - 1
+
+        # Repack once removals leave the plan mostly holes
+        if len(self.batches) > 2 * (len(self._batch_of) // self.batch_size + 1):
+            self._repack()
+        self._symbols = list(symbols)
+        return added, removed
+
+    def _repack(self):
+        symbols = [s for batch in self.batches for s in batch]
+        self.batches = [symbols[i:i + self.batch_size] for i in range(0, len(symbols), self.batch_size)]
+        self._batch_of = {s: i for i, batch in enumerate(self.batches) for s in batch}
+
 class TradingBot:
     def __init__(self, config):
         self.config = config
+        self._config_sig = None
+        self.batch_plan = SymbolBatchPlan()
+        self.position_fetcher = None
+        self.history = None
+        # Consolidation policy is set by the first run_iteration's config load
         self.manager = ActiveLotsManager()
         self.api = AlpacaAPI()
+
+    def _consolidation_policy(self):
+        """
+        Returns the lot consolidation settings, capping the bucket at MAX_BUCKET_FRACTION
+        of sell_rise_percent so a merged lot's sell trigger stays close to its parts'.
+        Called once per config change.
+        """
+        policy = dict(self.config.get('consolidation', {}))
+        max_bucket = self.config['sell_rise_percent'] * MAX_BUCKET_FRACTION
+        if policy.get('bucket_percent', 0.0) > max_bucket:
+            logger.warning(f"Consolidation bucket {policy['bucket_percent']}% is wider than {max_bucket:.2f}% "
+                           f"({MAX_BUCKET_FRACTION:.0%} of sell_rise_percent). Clamping.")
+            policy['bucket_percent'] = max_bucket
+        return policy
         
     def execute_buy(self, symbol, amount, price):
         # amount is in USD (notional)
@@ -330,13 +819,10 @@ class TradingBot:
         current_value = price * quantity
         profit = current_value - cost_basis
 
+        sell_quantity = get_sell_quantity(lot, price, self.config['profit_mode'])
         if self.config['profit_mode'] == 'LEAVE':
-            # Sell only the cost basis worth of shares
-            sell_quantity = cost_basis / price
-            sell_quantity = min(sell_quantity, quantity)
             logger.info(f"PROFIT MODE LEAVE: Selling cost basis, leaving profit in shares.")
         else: # 'TAKE'
-            sell_quantity = quantity
             logger.info(f"PROFIT MODE TAKE: Selling entire lot. Profit: {profit:.2f} {self.config['currency']}")
 
         # Alpaca uses 'qty' for shares in sell orders
@@ -354,78 +840,199 @@ class TradingBot:
             return True
         return False
 
+    def _is_near_trigger(self, current_price, lowest_buy):
+        """
+        True when a held symbol is within status_near_percent of either its buy or sell trigger.
+        """
+        near = self.config.get('status_near_percent', 0.5)
+        change = (current_price - lowest_buy) / lowest_buy * 100
+        to_buy = self.config['buy_drop_percent'] + change
+        to_sell = self.config['sell_rise_percent'] - change
+        return min(to_buy, to_sell) <= near
+
+    def _log_symbol_status(self, symbol, current_price, lowest_buy, num_lots):
+        status_msg = f"{symbol:8}: {current_price:8.4f} {self.config['currency']}"
+        if lowest_buy:
+            drop = (lowest_buy - current_price) / lowest_buy * 100
+            status_msg += f" | Lowest Buy: {lowest_buy:8.4f} ({drop:6.2f}% drop) | Lots: {num_lots}"
+        else:
+            status_msg += " | No active lots"
+
+        logger.info(status_msg)
+
+    def _apply_reconciliation(self):
+        if self.position_fetcher is None:
+            return
+        settings = self.config.get('reconcile', {})
+        while not self.position_fetcher.results.empty():
+            fetched_at, positions, open_symbols = self.position_fetcher.results.get()
+            updates, mismatches = reconcile_lots(
+                self.manager, positions, open_symbols, since=fetched_at,
+                tolerance_percent=settings.get('tolerance_percent', 1.0),
+                correct=settings.get('mode', 'flag') == 'correct',
+                profit_mode=self.config['profit_mode']
+            )
+            for symbol, local_qty, broker_qty, action in mismatches:
+                logger.warning(f"RECONCILE: {symbol} local {local_qty:.6f} vs broker {broker_qty:.6f} -> {action}")
+            self.manager.replace_lots(updates)
+            logger.info(f"RECONCILE: {len(positions)} positions checked, {len(mismatches)} mismatches, {len(updates)} symbols corrected")
+
+    def run_iteration(self):
+        """
+        Runs a single pass: reloads config, fetches prices and executes grid actions.
+        """
+        # Reload configuration only when the file changed
+        sig = file_signature(CONFIG_FILE)
+        if sig is None or sig != self._config_sig:
+            self.config = load_config()
+            self._config_sig = sig
+            self.manager.consolidation = self._consolidation_policy()
+        self.config["dry_run"] = os.getenv("TRADING_MODE", "DRY") == "DRY"
+        self._apply_reconciliation()
+        
+        market_open = self.api.is_market_open()
+        
+        # Calculate dynamic stake
+        stake_settings = self.config.get("stake_settings", {})
+        balances = None
+        if stake_settings.get("mode") == "percent":
+            balances = self.api.get_account_balances()
+            equity = balances[0]
+            if equity:
+                trade_amount = equity * (stake_settings.get("percent_amount", 1.0) / 100.0)
+                logger.info(f"Dynamic Stake: {stake_settings['percent_amount']}% of ${equity:.2f} = ${trade_amount:.2f}")
+            else:
+                trade_amount = stake_settings.get("fixed_amount", 10.0)
+                logger.warning(f"Could not fetch equity. Falling back to fixed stake: ${trade_amount:.2f}")
+        else:
+            trade_amount = stake_settings.get("fixed_amount", 10.0)
+        
+        # Update config with current loop's trade_amount
+        self.config['trade_amount'] = trade_amount
+
+        symbols = self.config['symbols']
+        added, removed = self.batch_plan.update(symbols)
+        if added or removed:
+            logger.info(f"Symbol list changed: +{len(added)} / -{len(removed)}")
+        
+        # Fetch all prices in batches for efficiency
+        all_prices = {}
+        for batch in self.batch_plan.batches:
+            if batch:
+                all_prices.update(self.api.get_multiple_prices(batch))
+
+        # "full" logs every symbol; "summary" logs one line per iteration plus
+        # symbols near a trigger and a random sample of the rest
+        summary_mode = self.config.get('status_mode', 'full') == 'summary'
+        sample_rate = self.config.get('status_sample_rate', 0.0)
+        quoted = missing = near = unheld = bought = sold = 0
+            
+        for symbol in symbols:
+            current_price = all_prices.get(symbol)
+            if current_price is None:
+                # Fallback for individual price if batch failed or missing
+                current_price = self.api.get_current_price(symbol)
+            
+            if current_price is None:
+                missing += 1
+                continue
+            all_prices[symbol] = current_price
+            quoted += 1
+            
+            lowest_buy = self.manager.get_lowest_buy_price(symbol)
+            
+            if not summary_mode:
+                self._log_symbol_status(symbol, current_price, lowest_buy, self.manager.get_lot_count(symbol))
+            elif lowest_buy is None:
+                # Unheld symbols buy on sight, so they are counted rather than logged
+                unheld += 1
+            elif self._is_near_trigger(current_price, lowest_buy):
+                near += 1
+                self._log_symbol_status(symbol, current_price, lowest_buy, self.manager.get_lot_count(symbol))
+            elif sample_rate and random.random() < sample_rate:
+                self._log_symbol_status(symbol, current_price, lowest_buy, self.manager.get_lot_count(symbol))
+            
+            # Execute actions (Alpaca will queue orders if market is closed)
+            actions = check_grid_triggers(symbol, current_price, self.manager, self.config)
+            
+            # Sort sells to avoid index shifting issues (though we pop anyway)
+            sells = sorted([a for a in actions if a[0] == 'SELL'], key=lambda x: x[1], reverse=True)
+            buys = [a for a in actions if a[0] == 'BUY']
+            
+            for _, lot_index, price in sells:
+                if self.execute_sell(symbol, lot_index, price):
+                    sold += 1
+            
+            for _, price, amount in buys:
+                if self.execute_buy(symbol, amount, price):
+                    bought += 1
+
+        if summary_mode:
+            logger.info(
+                f"ITERATION SUMMARY: {quoted}/{len(symbols)} quoted | {missing} missing | "
+                f"{near} within {self.config.get('status_near_percent', 0.5)}% of trigger | {unheld} unheld | "
+                f"{bought} buys | {sold} sells"
+            )
+
+        self._record_history(all_prices, balances)
+
+    def _record_history(self, prices, balances=None):
+        """
+        Records equity, cash, basis and market value. Reuses the balances fetched for
+        the percent stake at the start of the iteration, if any.
+
+        Held symbols without a usable price in prices (removed from the config, or
+        quoted with a 0 ask) are priced from quotes and then last trades. If any stays
+        unpriced the sample is skipped, since valuing it at zero would chart a false drop.
+        """
+        if self.history is None:
+            return
+        unpriced = [s for s in self.manager.symbol_stats if not prices.get(s)]
+        if unpriced:
+            prices = dict(prices)
+            batch_size = self.batch_plan.batch_size
+            for fetch in (self.api.get_multiple_prices, self.api.get_multiple_trade_prices):
+                for i in range(0, len(unpriced), batch_size):
+                    prices.update({s: p for s, p in fetch(unpriced[i:i + batch_size]).items() if p})
+                unpriced = [s for s in unpriced if not prices.get(s)]
+                if not unpriced:
+                    break
+            else:
+                logger.warning(f"History sample skipped: no price for {len(unpriced)} held symbols")
+                return
+        if balances is None or balances[0] is None:
+            balances = self.api.get_account_balances()
+        equity, cash = balances
+        if equity is None:
+            return
+        try:
+            self.history.record(equity, cash, self.manager.total_basis, self.manager.get_market_value(prices))
+        except Exception as e:
+            logger.error(f"Error recording history: {e}")
+
     def run(self):
         logger.info("="*60)
         logger.info("ALPACA DIP BUYING GRID BOT STARTED")
         logger.info("="*60)
 
+        # Profile the next N iterations on PROFILE_ITERATIONS=N or SIGUSR1
+        profiler = profiling.OnDemandProfiler("bot")
+        profiling.arm_from_env(profiler, "PROFILE_ITERATIONS")
+        profiling.install_signal_handler(profiler)
+
+        # Broker positions are pulled in the background; see _apply_reconciliation
+        self.position_fetcher = PositionFetcher(lambda: self.config.get('reconcile', {}))
+        self.position_fetcher.start()
+
+        try:
+            self.history = history.HistoryStore(writable=True)
+        except Exception as e:
+            logger.error(f"History disabled, could not open {history.HISTORY_FILE}: {e}")
+
         try:
             while True:
-                # Reload configuration
-                self.config = load_config()
-                self.config["dry_run"] = os.getenv("TRADING_MODE", "DRY") == "DRY"
-                
-                market_open = self.api.is_market_open()
-                
-                # Calculate dynamic stake
-                stake_settings = self.config.get("stake_settings", {})
-                if stake_settings.get("mode") == "percent":
-                    equity = self.api.get_account_equity()
-                    if equity:
-                        trade_amount = equity * (stake_settings.get("percent_amount", 1.0) / 100.0)
-                        logger.info(f"Dynamic Stake: {stake_settings['percent_amount']}% of ${equity:.2f} = ${trade_amount:.2f}")
-                    else:
-                        trade_amount = stake_settings.get("fixed_amount", 10.0)
-                        logger.warning(f"Could not fetch equity. Falling back to fixed stake: ${trade_amount:.2f}")
-                else:
-                    trade_amount = stake_settings.get("fixed_amount", 10.0)
-                
-                # Update config with current loop's trade_amount
-                self.config['trade_amount'] = trade_amount
-
-                symbols = self.config['symbols']
-                
-                # Fetch all prices in batches for efficiency
-                all_prices = {}
-                batch_size = 200
-                for i in range(0, len(symbols), batch_size):
-                    batch = symbols[i:i + batch_size]
-                    all_prices.update(self.api.get_multiple_prices(batch))
-                    
-                for symbol in symbols:
-                    current_price = all_prices.get(symbol)
-                    if current_price is None:
-                        # Fallback for individual price if batch failed or missing
-                        current_price = self.api.get_current_price(symbol)
-                    
-                    if current_price is None:
-                        continue
-                    
-                    lowest_buy = self.manager.get_lowest_buy_price(symbol)
-                    num_lots = len(self.manager.get_lots(symbol))
-                    
-                    status_msg = f"{symbol:8}: {current_price:8.4f} {self.config['currency']}"
-                    if lowest_buy:
-                        drop = (lowest_buy - current_price) / lowest_buy * 100
-                        status_msg += f" | Lowest Buy: {lowest_buy:8.4f} ({drop:6.2f}% drop) | Lots: {num_lots}"
-                    else:
-                        status_msg += " | No active lots"
-                    
-                    logger.info(status_msg)
-                    
-                    # Execute actions (Alpaca will queue orders if market is closed)
-                    actions = check_grid_triggers(symbol, current_price, self.manager, self.config)
-                    
-                    # Sort sells to avoid index shifting issues (though we pop anyway)
-                    sells = sorted([a for a in actions if a[0] == 'SELL'], key=lambda x: x[1], reverse=True)
-                    buys = [a for a in actions if a[0] == 'BUY']
-                    
-                    for _, lot_index, price in sells:
-                        self.execute_sell(symbol, lot_index, price)
-                    
-                    for _, price, amount in buys:
-                        self.execute_buy(symbol, amount, price)
-                                        
+                with profiler.profile("run_iteration"):
+                    self.run_iteration()
                 time.sleep(self.config['check_interval'])
         except KeyboardInterrupt:
             logger.info("Bot stopping...")
@@ -435,5 +1042,6 @@ class TradingBot:
             logger.info("Bot shutdown complete.")
 
 if __name__ == "__main__":
+    setup_logging()
     bot = TradingBot(CONFIG)
     bot.run()
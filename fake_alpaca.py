@@ -0,0 +1,391 @@
+"""
+Local stand-in for the Alpaca trading and market-data APIs, for load-testing the
+bot and dashboard offline.
+
+Prices follow an independent random walk per symbol, advanced lazily whenever the
+symbol is quoted, so tens of thousands of symbols cost nothing until requested.
+Any requested symbol gets a price; /v2/assets lists the synthetic universe.
+
+    python fake_alpaca.py --port 5001 --symbols 20000 --latency-ms 40 --rate-limit-rate 0.01
+
+Point the bot and dashboard at it with:
+    ALPACA_BASE_URL=http://127.0.0.1:5001 ALPACA_DATA_URL=http://127.0.0.1:5001
+"""
+import math
+import time
+import uuid
+import zlib
+import random
+import argparse
+import threading
+from datetime import datetime, timedelta, timezone
+from flask import Flask, jsonify, request
+
+app = Flask(__name__)
+
+SETTINGS = {
+    "latency_ms": 0.0,
+    "jitter_ms": 0.0,
+    "error_rate": 0.0,
+    "rate_limit_rate": 0.0,
+    "volatility": 0.0005,
+    "market_open": True,
+    "num_symbols": 10000,
+    "starting_cash": 100000.0
+}
+
+_lock = threading.RLock()
+_prices = {}
+_orders = {}
+_positions = {}
+_cash = [SETTINGS["starting_cash"]]
+
+def _now():
+    return datetime.now(timezone.utc)
+
+def _iso(dt):
+    return dt.isoformat().replace("+00:00", "Z")
+
+def synthetic_symbols(count):
+    return [f"S{i:05d}" for i in range(count)]
+
+def _asset_id(symbol):
+    return str(uuid.uuid5(uuid.NAMESPACE_DNS, symbol))
+
+def get_price(symbol):
+    """
+    Advances the symbol's random walk to now and returns the price.
+    """
+    now = time.time()
+    with _lock:
+        state = _prices.get(symbol)
+        if state is None:
+            # Stable starting price per symbol
+            seed_rng = random.Random(zlib.crc32(symbol.encode()))
+            state = _prices[symbol] = [seed_rng.uniform(2, 500), now]
+        dt = now - state[1]
+        if dt > 0:
+            state[0] *= math.exp(SETTINGS["volatility"] * math.sqrt(dt) * random.gauss(0, 1))
+            state[1] = now
+        return state[0]
+
+def _error(status, message):
+    response = jsonify({"code": status * 100000, "message": message})
+    response.status_code = status
+    return response
+
+@app.before_request
+def inject_faults():
+    delay = SETTINGS["latency_ms"] + random.gauss(0, SETTINGS["jitter_ms"]) if SETTINGS["jitter_ms"] else SETTINGS["latency_ms"]
+    if delay > 0:
+        time.sleep(delay / 1000.0)
+    roll = random.random()
+    if roll < SETTINGS["rate_limit_rate"]:
+        return _error(429, "rate limit exceeded")
+    if roll < SETTINGS["rate_limit_rate"] + SETTINGS["error_rate"]:
+        return _error(500, "injected error")
+
+# =============== MARKET DATA ===============
+def _requested_symbols():
+    return [s for s in request.args.get("symbols", "").split(",") if s]
+
+@app.route('/v2/stocks/quotes/latest')
+def latest_quotes():
+    timestamp = _iso(_now())
+    quotes = {}
+    for symbol in _requested_symbols():
+        price = get_price(symbol)
+        quotes[symbol] = {
+            "t": timestamp, "ax": "V", "ap": round(price * 1.0005, 4), "as": 1,
+            "bx": "V", "bp": round(price * 0.9995, 4), "bs": 1, "c": ["R"], "z": "C"
+        }
+    return jsonify({"quotes": quotes})
+
+@app.route('/v2/stocks/trades/latest')
+def latest_trades():
+    timestamp = _iso(_now())
+    trades = {}
+    for symbol in _requested_symbols():
+        trades[symbol] = {
+            "t": timestamp, "x": "V", "p": round(get_price(symbol), 4), "s": 100,
+            "c": ["@"], "i": random.getrandbits(32), "z": "C"
+        }
+    return jsonify({"trades": trades})
+
+# =============== TRADING ===============
+@app.route('/v2/clock')
+def clock():
+    now = _now()
+    return jsonify({
+        "timestamp": _iso(now),
+        "is_open": SETTINGS["market_open"],
+        "next_open": _iso(now + timedelta(hours=16)),
+        "next_close": _iso(now + timedelta(hours=8))
+    })
+
+def _market_value():
+    return sum(position["qty"] * get_price(symbol) for symbol, position in list(_positions.items()))
+
+@app.route('/v2/account')
+def account():
+    cash = _cash[0]
+    long_value = _market_value()
+    equity = cash + long_value
+    return jsonify({
+        "id": "00000000-0000-0000-0000-000000000001",
+        "account_number": "FAKE000001",
+        "status": "ACTIVE",
+        "crypto_status": "ACTIVE",
+        "currency": "USD",
+        "buying_power": str(cash),
+        "regt_buying_power": str(cash),
+        "daytrading_buying_power": "0",
+        "non_marginable_buying_power": str(cash),
+        "cash": str(cash),
+        "accrued_fees": "0",
+        "pending_transfer_in": "0",
+        "portfolio_value": str(equity),
+        "pattern_day_trader": False,
+        "trading_blocked": False,
+        "transfers_blocked": False,
+        "account_blocked": False,
+        "created_at": "2024-01-01T00:00:00Z",
+        "trade_suspended_by_user": False,
+        "multiplier": "1",
+        "shorting_enabled": False,
+        "equity": str(equity),
+        "last_equity": str(equity),
+        "long_market_value": str(long_value),
+        "short_market_value": "0",
+        "initial_margin": "0",
+        "maintenance_margin": "0",
+        "last_maintenance_margin": "0",
+        "sma": "0",
+        "daytrade_count": 0
+    })
+
+def _asset_json(symbol):
+    return {
+        "id": _asset_id(symbol),
+        "class": "us_equity",
+        "exchange": "NASDAQ",
+        "symbol": symbol,
+        "name": f"{symbol} Synthetic Corp",
+        "status": "active",
+        "tradable": True,
+        "marginable": True,
+        "shortable": False,
+        "easy_to_borrow": False,
+        "fractionable": True,
+        "attributes": []
+    }
+
+@app.route('/v2/assets')
+def assets():
+    return jsonify([_asset_json(symbol) for symbol in synthetic_symbols(SETTINGS["num_symbols"])])
+
+@app.route('/v2/assets/<symbol>')
+def asset(symbol):
+    return jsonify(_asset_json(symbol))
+
+def _order_json(order):
+    return {k: v for k, v in order.items() if not k.startswith("_")}
+
+def _fill(order):
+    symbol = order["symbol"]
+    price = get_price(symbol)
+    if order["_notional"] is not None:
+        qty = order["_notional"] / price
+    else:
+        qty = order["_qty"]
+
+    position = _positions.setdefault(symbol, {"qty": 0.0, "cost_basis": 0.0})
+    if order["side"] == "buy":
+        position["qty"] += qty
+        position["cost_basis"] += qty * price
+        _cash[0] -= qty * price
+    else:
+        avg_price = position["cost_basis"] / position["qty"]
+        position["qty"] -= qty
+        position["cost_basis"] -= qty * avg_price
+        _cash[0] += qty * price
+        if position["qty"] <= 1e-9:
+            del _positions[symbol]
+
+    now = _iso(_now())
+    order.update({
+        "status": "filled",
+        "filled_qty": str(qty),
+        "filled_avg_price": str(price),
+        "filled_at": now,
+        "updated_at": now
+    })
+
+@app.route('/v2/orders', methods=['POST'])
+def submit_order():
+    data = request.get_json(force=True)
+    symbol = data["symbol"]
+    side = data["side"]
+    notional = float(data["notional"]) if data.get("notional") else None
+    qty = float(data["qty"]) if data.get("qty") else None
+    if notional is None and qty is None:
+        return _error(422, "qty or notional is required")
+
+    with _lock:
+        held = _positions.get(symbol, {}).get("qty", 0.0)
+    if side == "sell" and (qty or 0) > held + 1e-9:
+        return _error(403, f"insufficient qty available for order (requested: {qty}, available: {held})")
+
+    now = _iso(_now())
+    order = {
+        "id": str(uuid.uuid4()),
+        "client_order_id": data.get("client_order_id") or str(uuid.uuid4()),
+        "created_at": now,
+        "updated_at": now,
+        "submitted_at": now,
+        "filled_at": None,
+        "asset_id": _asset_id(symbol),
+        "symbol": symbol,
+        "asset_class": "us_equity",
+        "notional": str(notional) if notional is not None else None,
+        "qty": str(qty) if qty is not None else None,
+        "filled_qty": "0",
+        "filled_avg_price": None,
+        "order_class": "simple",
+        "order_type": data.get("type", "market"),
+        "type": data.get("type", "market"),
+        "side": side,
+        "time_in_force": data.get("time_in_force", "day"),
+        "status": "accepted",
+        "extended_hours": False,
+        "_notional": notional,
+        "_qty": qty
+    }
+    if SETTINGS["market_open"]:
+        get_price(symbol)
+        with _lock:
+            _fill(order)
+    with _lock:
+        _orders[order["id"]] = order
+    return jsonify(_order_json(order))
+
+@app.route('/v2/orders', methods=['GET'])
+def list_orders():
+    status = request.args.get("status", "open")
+    limit = request.args.get("limit", 50, type=int)
+    with _lock:
+        orders = list(_orders.values())
+    if status == "open":
+        orders = [o for o in orders if o["status"] == "accepted"]
+    elif status == "closed":
+        orders = [o for o in orders if o["status"] != "accepted"]
+    return jsonify([_order_json(o) for o in orders[-limit:]])
+
+@app.route('/v2/orders/<order_id>')
+def get_order(order_id):
+    order = _orders.get(order_id)
+    if order is None:
+        return _error(404, "order not found")
+    return jsonify(_order_json(order))
+
+@app.route('/v2/orders', methods=['DELETE'])
+def cancel_orders():
+    cancelled = []
+    with _lock:
+        for order in _orders.values():
+            if order["status"] == "accepted":
+                order["status"] = "canceled"
+                order["canceled_at"] = _iso(_now())
+                cancelled.append({"id": order["id"], "status": 200})
+    return jsonify(cancelled)
+
+def _position_json(symbol, position):
+    price = get_price(symbol)
+    qty = position["qty"]
+    market_value = qty * price
+    avg_entry = position["cost_basis"] / qty
+    unrealized = market_value - position["cost_basis"]
+    return {
+        "asset_id": _asset_id(symbol),
+        "symbol": symbol,
+        "exchange": "NASDAQ",
+        "asset_class": "us_equity",
+        "avg_entry_price": str(avg_entry),
+        "qty": str(qty),
+        "qty_available": str(qty),
+        "side": "long",
+        "market_value": str(market_value),
+        "cost_basis": str(position["cost_basis"]),
+        "unrealized_pl": str(unrealized),
+        "unrealized_plpc": str(unrealized / position["cost_basis"]),
+        "unrealized_intraday_pl": str(unrealized),
+        "unrealized_intraday_plpc": str(unrealized / position["cost_basis"]),
+        "current_price": str(price),
+        "lastday_price": str(price),
+        "change_today": "0"
+    }
+
+@app.route('/v2/positions')
+def positions():
+    with _lock:
+        held = list(_positions.items())
+    return jsonify([_position_json(symbol, position) for symbol, position in held])
+
+@app.route('/v2/positions', methods=['DELETE'])
+def close_positions():
+    if request.args.get("cancel_orders") == "true":
+        cancel_orders()
+    responses = []
+    with _lock:
+        held = list(_positions.items())
+    for symbol, position in held:
+        now = _iso(_now())
+        order = {
+            "id": str(uuid.uuid4()), "client_order_id": str(uuid.uuid4()),
+            "created_at": now, "updated_at": now, "submitted_at": now,
+            "asset_id": _asset_id(symbol), "symbol": symbol, "asset_class": "us_equity",
+            "qty": str(position["qty"]), "filled_qty": "0", "order_class": "simple",
+            "order_type": "market", "type": "market", "side": "sell",
+            "time_in_force": "day", "status": "accepted", "extended_hours": False,
+            "_notional": None, "_qty": position["qty"]
+        }
+        if SETTINGS["market_open"]:
+            get_price(symbol)
+            with _lock:
+                _fill(order)
+        with _lock:
+            _orders[order["id"]] = order
+        responses.append({"symbol": symbol, "status": 200, "body": _order_json(order)})
+    return jsonify(responses)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5001)
+    parser.add_argument("--symbols", type=int, default=SETTINGS["num_symbols"], help="size of the /v2/assets universe")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="mean added latency per request")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="std deviation of the added latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="fraction of requests answered with 429")
+    parser.add_argument("--volatility", type=float, default=SETTINGS["volatility"], help="random walk sigma per sqrt(second)")
+    parser.add_argument("--market-closed", action="store_true", help="report the market closed and leave orders unfilled")
+    parser.add_argument("--cash", type=float, default=SETTINGS["starting_cash"])
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    SETTINGS.update({
+        "num_symbols": args.symbols,
+        "latency_ms": args.latency_ms,
+        "jitter_ms": args.jitter_ms,
+        "error_rate": args.error_rate,
+        "rate_limit_rate": args.rate_limit_rate,
+        "volatility": args.volatility,
+        "market_open": not args.market_closed,
+        "starting_cash": args.cash
+    })
+    _cash[0] = args.cash
+    app.run(host=args.host, port=args.port, threaded=True)
+
+if __name__ == "__main__":
+    main()
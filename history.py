@@ -0,0 +1,131 @@
+"""
+Fixed-size, memory-mapped equity and P/L history.
+
+One file holds a ring buffer per resolution (1 minute, 1 hour, 1 day). Each
+sample is written to every level; within a level's bucket the newest sample
+replaces the previous one, so coarser levels keep the last value per hour/day.
+The file never grows. Reads pick the finest level that covers the requested
+range, binary-search the ring and stride it down to at most max_points rows,
+so a query costs O(log n + max_points) whatever the range.
+"""
+import os
+import math
+import mmap
+import time
+import struct
+
+HISTORY_FILE = os.getenv("HISTORY_FILE", "history.bin")
+
+MAGIC = b"EQHIST01"
+FIELDS = ("timestamp", "equity", "cash", "basis", "market_value")
+ROW = struct.Struct("<" + "d" * len(FIELDS))
+
+# (resolution seconds, capacity): 14 days of minutes, 1 year of hours, 10 years of days
+LEVELS = ((60, 14 * 24 * 60), (3600, 365 * 24), (86400, 10 * 365))
+
+# Upper bound on rows returned per query; ranges with more samples are strided
+MAX_POINTS = 500
+
+# magic, number of levels
+FILE_HEADER = struct.Struct("<8sQ")
+# resolution, capacity, head (next slot), count
+LEVEL_HEADER = struct.Struct("<QQQQ")
+
+RANGES = {
+    "1h": 3600,
+    "1d": 86400,
+    "7d": 7 * 86400,
+    "30d": 30 * 86400,
+    "1y": 365 * 86400,
+    "all": None
+}
+
+def _layout(levels):
+    offset = FILE_HEADER.size + LEVEL_HEADER.size * len(levels)
+    offsets = []
+    for _, capacity in levels:
+        offsets.append(offset)
+        offset += capacity * ROW.size
+    return offsets, offset
+
+class HistoryStore:
+    def __init__(self, path=HISTORY_FILE, writable=False, levels=LEVELS):
+        self.path = path
+        self.levels = levels
+        self._data_offsets, size = _layout(levels)
+
+        if writable and (not os.path.exists(path) or os.path.getsize(path) != size):
+            self._create(size)
+
+        with open(path, 'r+b' if writable else 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_WRITE if writable else mmap.ACCESS_READ)
+
+        magic, num_levels = FILE_HEADER.unpack_from(self._mmap)
+        if magic != MAGIC or num_levels != len(levels):
+            raise ValueError(f"{path} is not a compatible history file")
+
+    def _create(self, size):
+        with open(self.path, 'wb') as f:
+            f.write(FILE_HEADER.pack(MAGIC, len(self.levels)))
+            for resolution, capacity in self.levels:
+                f.write(LEVEL_HEADER.pack(resolution, capacity, 0, 0))
+            f.truncate(size)
+
+    def _level_header(self, i):
+        return LEVEL_HEADER.unpack_from(self._mmap, FILE_HEADER.size + i * LEVEL_HEADER.size)
+
+    def _row(self, i, slot):
+        return ROW.unpack_from(self._mmap, self._data_offsets[i] + slot * ROW.size)
+
+    def record(self, equity, cash, basis, market_value, timestamp=None):
+        timestamp = timestamp or time.time()
+        row = (timestamp, equity, cash, basis, market_value)
+        for i in range(len(self.levels)):
+            resolution, capacity, head, count = self._level_header(i)
+            if count:
+                last_slot = (head - 1) % capacity
+                last_time = self._row(i, last_slot)[0]
+                if timestamp < last_time:
+                    continue
+                if int(timestamp // resolution) == int(last_time // resolution):
+                    # Same bucket: newest sample wins
+                    ROW.pack_into(self._mmap, self._data_offsets[i] + last_slot * ROW.size, *row)
+                    continue
+            ROW.pack_into(self._mmap, self._data_offsets[i] + head * ROW.size, *row)
+            # Header last, so readers never see a slot before it is written
+            LEVEL_HEADER.pack_into(self._mmap, FILE_HEADER.size + i * LEVEL_HEADER.size,
+                                   resolution, capacity, (head + 1) % capacity, min(count + 1, capacity))
+
+    def query(self, seconds=None, now=None, max_points=MAX_POINTS):
+        """
+        Samples from the last `seconds` (None for everything) at the finest resolution
+        that covers the range, thinned to at most max_points rows (always keeping the
+        newest). Returns (seconds between rows, [row, ...]) with rows as FIELDS tuples.
+        """
+        now = now or time.time()
+        level = len(self.levels) - 1
+        if seconds is not None:
+            for i, (resolution, capacity) in enumerate(self.levels):
+                if resolution * capacity >= seconds:
+                    level = i
+                    break
+        resolution, capacity, head, count = self._level_header(level)
+        start = (head - count) % capacity
+
+        def time_at(k):
+            return self._row(level, (start + k) % capacity)[0]
+
+        # Binary search for the first sample inside the range
+        lo, hi = 0, count
+        if seconds is not None:
+            since = now - seconds
+            while lo < hi:
+                mid = (lo + hi) // 2
+                if time_at(mid) < since:
+                    lo = mid + 1
+                else:
+                    hi = mid
+        stride = max(1, math.ceil((count - lo) / max_points))
+        # Anchor on the newest sample so the latest value is always included
+        first = lo + (count - 1 - lo) % stride
+        return resolution * stride, [self._row(level, (start + k) % capacity) for k in range(first, count, stride)]
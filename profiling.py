@@ -0,0 +1,212 @@
+"""
+On-demand profiling for the bot loop and Flask routes.
+
+An OnDemandProfiler is armed for the next N runs (loop iterations or requests).
+Each run is recorded with cProfile; when the last one finishes, the dumps, an
+optional tracemalloc snapshot and a top-functions summary are written to
+profiles/<name>-<timestamp>/.
+
+Arm it with an environment variable at startup (e.g. PROFILE_ITERATIONS=5),
+a signal (see install_signal_handler) or an arm file (see write_arm_request),
+which is how the /admin/profile route in web_ui reaches every gunicorn worker.
+"""
+import io
+import os
+import json
+import time
+import pstats
+import signal
+import logging
+import cProfile
+import threading
+import tracemalloc
+from contextlib import contextmanager
+import snapshot
+
+logger = logging.getLogger(__name__)
+
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+TOP_FUNCTIONS = 40
+TOP_ALLOCATIONS = 25
+
+class OnDemandProfiler:
+    def __init__(self, name, output_dir=PROFILE_DIR):
+        self.name = name
+        self.output_dir = output_dir
+        self._lock = threading.Lock()
+        self._remaining = 0
+        self._active = 0
+        self._started = 0
+        self._memory = False
+        self._session_dir = None
+        self._dumps = []
+        self._pending = None
+        self._created = time.time()
+        self._arm_file_sig = None
+
+    @property
+    def armed(self):
+        return self._remaining > 0
+
+    def request(self, count, memory=False):
+        """
+        Lock-free arm request, safe to call from a signal handler; applied on the next start().
+        """
+        self._pending = (count, memory)
+
+    def arm(self, count, memory=False):
+        """
+        Profiles the next count runs. Returns the output directory, or None if a session is already running.
+        """
+        with self._lock:
+            if self._remaining or self._active:
+                return None
+            self._remaining = count
+            self._memory = memory
+            self._dumps = []
+            self._started = 0
+            # pid keeps sessions of forked workers apart
+            self._session_dir = os.path.join(self.output_dir, f"{self.name}-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}")
+            os.makedirs(self._session_dir, exist_ok=True)
+            if memory and not tracemalloc.is_tracing():
+                tracemalloc.start()
+        logger.info(f"PROFILER: Armed for {count} {self.name} runs -> {self._session_dir}")
+        return self._session_dir
+
+    def start(self):
+        """
+        Starts profiling one run if armed. Returns a handle for stop(), or None.
+        """
+        if self._pending:
+            pending, self._pending = self._pending, None
+            self.arm(*pending)
+        if not self._remaining:
+            return None
+        with self._lock:
+            if not self._remaining:
+                return None
+            self._remaining -= 1
+            self._active += 1
+            self._started += 1
+            index = self._started
+        profile = cProfile.Profile()
+        profile.enable()
+        return profile, index, time.perf_counter()
+
+    def stop(self, handle, label=""):
+        if handle is None:
+            return
+        profile, index, started = handle
+        profile.disable()
+        elapsed = time.perf_counter() - started
+        path = os.path.join(self._session_dir, f"{index:03d}.prof")
+        profile.dump_stats(path)
+        logger.info(f"PROFILER: {self.name} run {index} {label} took {elapsed * 1000:.1f} ms -> {path}")
+
+        with self._lock:
+            self._dumps.append((path, label, elapsed))
+            self._active -= 1
+            finished = not self._remaining and not self._active
+        if finished:
+            self._write_summary()
+
+    def after_fork(self):
+        """
+        Resets per-process state in a forked child (see os.register_at_fork), so arm
+        requests written before the fork are not replayed by a newly started worker.
+        """
+        self._created = time.time()
+        self._arm_file_sig = None
+
+    def check_arm_file(self, path):
+        """
+        Arms once per new request written to path by write_arm_request. Requests made
+        before this profiler (or process, after after_fork) started are ignored, so a
+        leftover file does not re-arm restarted or replacement workers.
+        """
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return
+        sig = (st.st_ino, st.st_mtime_ns)
+        if sig == self._arm_file_sig:
+            return
+        self._arm_file_sig = sig
+        try:
+            with open(path) as f:
+                arm_request = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.error(f"PROFILER: Could not read arm request {path}: {e}")
+            return
+        # Compared with the writer's clock rather than the file mtime, which is coarser
+        if arm_request.get('requested_at', st.st_mtime) < self._created:
+            return
+        self.arm(arm_request.get('count', 10), memory=arm_request.get('memory', False))
+
+    @contextmanager
+    def profile(self, label=""):
+        handle = self.start()
+        try:
+            yield
+        finally:
+            self.stop(handle, label)
+
+    def _write_summary(self):
+        # Snapshot allocations before building the report adds its own
+        snapshot = None
+        if self._memory and tracemalloc.is_tracing():
+            snapshot = tracemalloc.take_snapshot()
+            tracemalloc.stop()
+
+        out = io.StringIO()
+        out.write(f"{self.name}: {len(self._dumps)} profiled runs\n\n")
+        for path, label, elapsed in self._dumps:
+            out.write(f"{os.path.basename(path)}  {elapsed * 1000:10.1f} ms  {label}\n")
+
+        stats = pstats.Stats(*[path for path, _, _ in self._dumps], stream=out)
+        stats.strip_dirs()
+        for sort_key in ('cumulative', 'tottime'):
+            out.write(f"\n===== Top {TOP_FUNCTIONS} functions by {sort_key} =====\n")
+            stats.sort_stats(sort_key).print_stats(TOP_FUNCTIONS)
+
+        if snapshot is not None:
+            snapshot.dump(os.path.join(self._session_dir, "allocations.tracemalloc"))
+            out.write(f"\n===== Top {TOP_ALLOCATIONS} allocation sites =====\n")
+            for stat in snapshot.statistics('lineno')[:TOP_ALLOCATIONS]:
+                out.write(f"{stat}\n")
+
+        summary_path = os.path.join(self._session_dir, "summary.txt")
+        with open(summary_path, 'w') as f:
+            f.write(out.getvalue())
+        logger.info(f"PROFILER: Session complete. Summary written to {summary_path}")
+
+def arm_from_env(profiler, count_var):
+    """
+    Arms the profiler when count_var (e.g. PROFILE_ITERATIONS) is set; PROFILE_MEMORY=1 adds tracemalloc.
+    """
+    count = int(os.getenv(count_var, "0") or 0)
+    if count > 0:
+        profiler.arm(count, memory=os.getenv("PROFILE_MEMORY") == "1")
+
+def write_arm_request(path, count, memory=False):
+    """
+    Asks every process polling path with check_arm_file to profile its next count runs.
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    arm_request = {"count": count, "memory": memory, "requested_at": time.time()}
+    snapshot.atomic_write(path, [json.dumps(arm_request).encode()])
+
+def install_signal_handler(profiler, signum=None):
+    """
+    Arms the profiler for PROFILE_SIGNAL_COUNT runs (default 5) whenever signum
+    (SIGUSR1 by default) is received. No-op on platforms without it.
+    """
+    signum = signum or getattr(signal, "SIGUSR1", None)
+    if signum is None:
+        return
+    count = int(os.getenv("PROFILE_SIGNAL_COUNT", "5"))
+
+    def handler(_signum, _frame):
+        profiler.request(count, memory=os.getenv("PROFILE_MEMORY") == "1")
+
+    signal.signal(signum, handler)
@@ -0,0 +1,300 @@
+"""
+Compact binary snapshots of lots and config state.
+
+Lots snapshots are column arrays read through mmap. Opening one only parses the
+header, and looking up a symbol decodes just that symbol's lots. Per-symbol
+quantity, cost basis and lowest buy are stored alongside, so ActiveLotsManager
+can rebuild its aggregates without touching any lot.
+
+Convert between formats with:
+    python snapshot.py lots.json lots.snap
+    python snapshot.py lots.snap lots.json
+    python snapshot.py config.json config.snap
+"""
+import os
+import sys
+import json
+import mmap
+import struct
+import bisect
+import tempfile
+from array import array
+from collections.abc import MutableMapping
+
+SNAPSHOT_SUFFIX = ".snap"
+
+LOTS_MAGIC = b"LOTSNAP3"
+CONFIG_MAGIC = b"CFGSNAP1"
+
+# magic, num_symbols, num_lots, names_size
+LOTS_HEADER = struct.Struct("<8sQQQ")
+# magic, settings_size, symbols_size
+CONFIG_HEADER = struct.Struct("<8sQQ")
+
+def is_snapshot(path):
+    return str(path).endswith(SNAPSHOT_SUFFIX)
+
+def _pad8(n):
+    return (n + 7) & ~7
+
+def atomic_write(path, chunks):
+    """
+    Writes chunks to a temp file next to path and renames it into place, so readers
+    (and existing mmaps) never see a half-written file.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            for chunk in chunks:
+                f.write(chunk)
+        try:
+            os.chmod(tmp_path, os.stat(path).st_mode & 0o777)
+        except FileNotFoundError:
+            os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+# =============== LOTS ===============
+def write_lots_snapshot(lots, path):
+    """
+    Writes a {symbol: [lot, ...]} mapping as a lots snapshot.
+    """
+    symbols = sorted(lots)
+    names = bytearray()
+    name_offsets = array('Q', [0])
+    lot_starts = array('Q', [0])
+    sym_quantity = array('d')
+    sym_basis = array('d')
+    sym_lowest = array('d')
+    buy_prices = array('d')
+    quantities = array('d')
+    timestamps = array('d')
+    min_buy_prices = array('d')
+    max_buy_prices = array('d')
+
+    for symbol in symbols:
+        names += symbol.encode()
+        name_offsets.append(len(names))
+        symbol_lots = lots[symbol]
+        for lot in symbol_lots:
+            buy_prices.append(lot['buy_price'])
+            quantities.append(lot['quantity'])
+            timestamps.append(lot['timestamp'])
+            min_buy_prices.append(lot.get('min_buy_price', lot['buy_price']))
+            max_buy_prices.append(lot.get('max_buy_price', lot['buy_price']))
+        lot_starts.append(len(buy_prices))
+        sym_quantity.append(sum(lot['quantity'] for lot in symbol_lots))
+        sym_basis.append(sum(lot['quantity'] * lot['buy_price'] for lot in symbol_lots))
+        sym_lowest.append(min((lot.get('min_buy_price', lot['buy_price']) for lot in symbol_lots), default=0.0))
+
+    names += b"\0" * (_pad8(len(names)) - len(names))
+    header = LOTS_HEADER.pack(LOTS_MAGIC, len(symbols), len(buy_prices), len(names))
+    atomic_write(path, [
+        header,
+        name_offsets.tobytes(), lot_starts.tobytes(),
+        sym_quantity.tobytes(), sym_basis.tobytes(), sym_lowest.tobytes(),
+        bytes(names),
+        buy_prices.tobytes(), quantities.tobytes(), timestamps.tobytes(),
+        min_buy_prices.tobytes(), max_buy_prices.tobytes()
+    ])
+
+class LotsSnapshot:
+    """
+    Read-only, memory-mapped view of a lots snapshot.
+    """
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+        if size < LOTS_HEADER.size:
+            raise ValueError(f"{path} is not a lots snapshot")
+        magic, num_symbols, num_lots, names_size = LOTS_HEADER.unpack_from(self._mmap)
+        if magic != LOTS_MAGIC:
+            raise ValueError(f"{path} is not a lots snapshot")
+
+        view = memoryview(self._mmap)
+        offset = LOTS_HEADER.size
+
+        def take(count, fmt):
+            nonlocal offset
+            part = view[offset:offset + count * 8].cast(fmt)
+            offset += count * 8
+            return part
+
+        self.num_symbols = num_symbols
+        self.num_lots = num_lots
+        self._name_offsets = take(num_symbols + 1, 'Q')
+        self._lot_starts = take(num_symbols + 1, 'Q')
+        self._sym_quantity = take(num_symbols, 'd')
+        self._sym_basis = take(num_symbols, 'd')
+        self._sym_lowest = take(num_symbols, 'd')
+        self._names = view[offset:offset + names_size]
+        offset += names_size
+        self._buy_prices = take(num_lots, 'd')
+        self._quantities = take(num_lots, 'd')
+        self._timestamps = take(num_lots, 'd')
+        self._min_buy_prices = take(num_lots, 'd')
+        self._max_buy_prices = take(num_lots, 'd')
+
+    def __len__(self):
+        return self.num_symbols
+
+    def _name(self, i):
+        return bytes(self._names[self._name_offsets[i]:self._name_offsets[i + 1]]).decode()
+
+    def _index(self, symbol):
+        # Binary search over the sorted name table, decoding O(log n) names
+        i = bisect.bisect_left(range(self.num_symbols), symbol, key=self._name)
+        if i < self.num_symbols and self._name(i) == symbol:
+            return i
+        return None
+
+    def __contains__(self, symbol):
+        return self._index(symbol) is not None
+
+    def symbols(self):
+        names = bytes(self._names)
+        return [names[self._name_offsets[i]:self._name_offsets[i + 1]].decode() for i in range(self.num_symbols)]
+
+    def get_lots(self, symbol):
+        i = self._index(symbol)
+        if i is None:
+            return []
+        return self._decode(i)
+
+    def _decode(self, i):
+        start, end = self._lot_starts[i], self._lot_starts[i + 1]
+        lots = []
+        for price, quantity, timestamp, min_price, max_price in zip(
+            self._buy_prices[start:end], self._quantities[start:end], self._timestamps[start:end],
+            self._min_buy_prices[start:end], self._max_buy_prices[start:end]
+        ):
+            lot = {'buy_price': price, 'quantity': quantity, 'timestamp': timestamp}
+            if min_price != price or max_price != price:
+                # Merged lot (see bot.merge_lots)
+                lot['min_buy_price'] = min_price
+                lot['max_buy_price'] = max_price
+            lots.append(lot)
+        return lots
+
+    def get_stats(self, symbol):
+        i = self._index(symbol)
+        if i is None:
+            return None
+        return self._stats(i)
+
+    def _stats(self, i):
+        return {
+            'quantity': self._sym_quantity[i],
+            'cost_basis': self._sym_basis[i],
+            'lot_count': self._lot_starts[i + 1] - self._lot_starts[i],
+            'lowest_buy': self._sym_lowest[i]
+        }
+
+    def to_dict(self):
+        return {symbol: self._decode(i) for i, symbol in enumerate(self.symbols())}
+
+class LazyLots(MutableMapping):
+    """
+    {symbol: [lot, ...]} mapping backed by a LotsSnapshot.
+    A symbol's lots are decoded on first access and cached; writes only touch the cache.
+    """
+    def __init__(self, snapshot):
+        self._snapshot = snapshot
+        self._index = {symbol: i for i, symbol in enumerate(snapshot.symbols())}
+        self._cache = {}
+
+    def __getitem__(self, symbol):
+        lots = self._cache.get(symbol)
+        if lots is None:
+            i = self._index.get(symbol)
+            if i is None:
+                raise KeyError(symbol)
+            lots = self._cache[symbol] = self._snapshot._decode(i)
+        return lots
+
+    def __setitem__(self, symbol, lots):
+        self._cache[symbol] = lots
+        if symbol not in self._index:
+            self._index[symbol] = None
+
+    def __delitem__(self, symbol):
+        del self._index[symbol]
+        self._cache.pop(symbol, None)
+
+    def __iter__(self):
+        return iter(self._index)
+
+    def __len__(self):
+        return len(self._index)
+
+    def __contains__(self, symbol):
+        return symbol in self._index
+
+    def stored_stats(self, symbol):
+        """
+        Aggregates recorded in the snapshot for symbols not modified since loading.
+        """
+        i = self._index.get(symbol)
+        if i is None or symbol in self._cache:
+            return None
+        return self._snapshot._stats(i)
+
+def read_lots(path):
+    return LazyLots(LotsSnapshot(path))
+
+# =============== CONFIG ===============
+def write_config_snapshot(config, path):
+    """
+    Stores the symbol list as a newline-separated blob and the remaining settings as compact JSON.
+    """
+    settings = {k: v for k, v in config.items() if k != 'symbols'}
+    settings_blob = json.dumps(settings, separators=(',', ':')).encode()
+    symbols_blob = "\n".join(config.get('symbols', [])).encode()
+    atomic_write(path, [CONFIG_HEADER.pack(CONFIG_MAGIC, len(settings_blob), len(symbols_blob)), settings_blob, symbols_blob])
+
+def read_config_snapshot(path):
+    with open(path, 'rb') as f:
+        data = f.read()
+    magic, settings_size, symbols_size = CONFIG_HEADER.unpack_from(data)
+    if magic != CONFIG_MAGIC:
+        raise ValueError(f"{path} is not a config snapshot")
+    offset = CONFIG_HEADER.size
+    config = json.loads(data[offset:offset + settings_size])
+    offset += settings_size
+    symbols_blob = data[offset:offset + symbols_size].decode()
+    config['symbols'] = symbols_blob.split("\n") if symbols_blob else []
+    return config
+
+# =============== CONVERSION ===============
+def _read_any(path):
+    if not is_snapshot(path):
+        with open(path, 'r') as f:
+            return json.load(f)
+    with open(path, 'rb') as f:
+        magic = f.read(8)
+    if magic == CONFIG_MAGIC:
+        return read_config_snapshot(path)
+    return LotsSnapshot(path).to_dict()
+
+def convert(src, dst):
+    """
+    Converts between JSON and snapshot files. Config vs lots is detected from the content.
+    """
+    data = _read_any(src)
+    if not is_snapshot(dst):
+        with open(dst, 'w') as f:
+            json.dump(data, f, indent=4)
+    elif isinstance(data.get('symbols'), list):
+        write_config_snapshot(data, dst)
+    else:
+        write_lots_snapshot(data, dst)
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print(__doc__)
+        sys.exit(1)
+    convert(sys.argv[1], sys.argv[2])
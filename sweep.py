@@ -0,0 +1,260 @@
+"""
+Parallel parameter sweep for the grid strategy.
+
+Replays locally stored price series through the bot's own check_grid_triggers and
+get_sell_quantity for every combination in a parameter grid, across a process pool.
+Prices are loaded once into shared memory, so workers read them without copies.
+
+Price data: a directory of <SYMBOL>.csv files with a price (or close) column, one row per step.
+
+Grid file (JSON): lists of values per setting, plus optional symbol groups (glob patterns):
+    {
+        "groups": {"all": ["*"], "tech": ["AAPL", "MSFT", "NV*"]},
+        "buy_drop_percent": [0.5, 1.0, 2.0],
+        "sell_rise_percent": [1.0, 2.0, 3.0],
+        "profit_mode": ["TAKE", "LEAVE"],
+        "stake_settings": [{"mode": "fixed", "fixed_amount": 10.0}, {"mode": "percent", "percent_amount": 1.0}]
+    }
+
+    python sweep.py --prices data/ --grid grid.json --processes 8 --top 20
+"""
+import os
+import csv
+import json
+import time
+import random
+import fnmatch
+import logging
+import argparse
+import itertools
+from array import array
+from multiprocessing import Pool, shared_memory
+
+from bot import ActiveLotsManager, check_grid_triggers, get_sell_quantity, setup_logging
+
+DEFAULTS = {
+    "buy_drop_percent": 1.0,
+    "sell_rise_percent": 2.0,
+    "profit_mode": "TAKE",
+    "stake_settings": {"mode": "fixed", "fixed_amount": 10.0, "percent_amount": 1.0},
+    "always_on": True,
+    "always_on_amount": 1.0
+}
+
+SORT_KEYS = {
+    "return": lambda r: (-r['return_pct'], r['max_drawdown_pct']),
+    "drawdown": lambda r: (r['max_drawdown_pct'], -r['return_pct']),
+    "capital": lambda r: (r['peak_capital_used'], -r['return_pct'])
+}
+
+# =============== PRICE DATA ===============
+def load_price_series(directory):
+    """
+    Reads <SYMBOL>.csv files into {symbol: [price, ...]}.
+    """
+    series = {}
+    for name in sorted(os.listdir(directory)):
+        if not name.endswith(".csv"):
+            continue
+        with open(os.path.join(directory, name), newline='') as f:
+            rows = list(csv.reader(f))
+        if not rows:
+            continue
+        header = [h.strip().lower() for h in rows[0]]
+        column = next((header.index(c) for c in ('price', 'close') if c in header), None)
+        if column is None:
+            # No header: last column holds the price
+            column, body = len(rows[0]) - 1, rows
+        else:
+            body = rows[1:]
+        prices = [float(row[column]) for row in body if row and row[column]]
+        if prices:
+            series[name[:-4]] = prices
+    return series
+
+def synthetic_series(num_symbols, steps, seed):
+    rng = random.Random(seed)
+    series = {}
+    for i in range(num_symbols):
+        price = rng.uniform(5, 500)
+        path = []
+        for _ in range(steps):
+            price *= 1 + rng.gauss(0, 0.015)
+            path.append(price)
+        series[f"S{i:05d}"] = path
+    return series
+
+def to_shared_memory(series):
+    """
+    Packs all series into one shared float64 block. Returns (shm, layout) where
+    layout maps symbol -> (offset, length).
+    """
+    total = sum(len(prices) for prices in series.values())
+    shm = shared_memory.SharedMemory(create=True, size=max(total, 1) * 8)
+    view = shm.buf.cast('d')
+    layout = {}
+    offset = 0
+    for symbol, prices in series.items():
+        view[offset:offset + len(prices)] = array('d', prices)
+        layout[symbol] = (offset, len(prices))
+        offset += len(prices)
+    view.release()
+    return shm, layout
+
+# =============== WORKER ===============
+_worker = {}
+
+def _init_worker(shm_name, layout):
+    setup_logging(logging.WARNING)
+    shm = shared_memory.SharedMemory(name=shm_name)
+    _worker['shm'] = shm
+    _worker['prices'] = shm.buf.cast('d')
+    _worker['layout'] = layout
+
+def simulate(symbols, params, capital):
+    """
+    Replays the grid logic for one parameter set over the given symbols' price series.
+    """
+    prices = _worker['prices']
+    layout = _worker['layout']
+    config = dict(DEFAULTS, **params)
+    stake = dict(DEFAULTS['stake_settings'], **config['stake_settings'])
+
+    manager = ActiveLotsManager(filename=None)
+    cash = capital
+    leftover = {}  # shares left behind by LEAVE sells
+    last_price = {}
+    peak_equity = capital
+    max_drawdown = 0.0
+    peak_capital_used = 0.0
+    trades = 0
+    skipped_buys = 0
+
+    steps = max((layout[s][1] for s in symbols), default=0)
+    for step in range(steps):
+        for symbol in symbols:
+            offset, length = layout[symbol]
+            if step < length:
+                last_price[symbol] = prices[offset + step]
+
+        equity = cash + manager.get_market_value(last_price) + sum(q * last_price[s] for s, q in leftover.items())
+        peak_equity = max(peak_equity, equity)
+        max_drawdown = max(max_drawdown, (peak_equity - equity) / peak_equity * 100.0)
+        if stake.get('mode') == 'percent':
+            config['trade_amount'] = equity * stake.get('percent_amount', 1.0) / 100.0
+        else:
+            config['trade_amount'] = stake.get('fixed_amount', 10.0)
+
+        for symbol in symbols:
+            if step >= layout[symbol][1]:
+                continue
+            price = last_price[symbol]
+            actions = check_grid_triggers(symbol, price, manager, config)
+            for _, lot_index, sell_price in sorted((a for a in actions if a[0] == 'SELL'), key=lambda a: a[1], reverse=True):
+                lot = manager.get_lots(symbol)[lot_index]
+                sell_quantity = get_sell_quantity(lot, sell_price, config['profit_mode'])
+                cash += sell_quantity * sell_price
+                if lot['quantity'] > sell_quantity:
+                    leftover[symbol] = leftover.get(symbol, 0.0) + lot['quantity'] - sell_quantity
+                manager.remove_lot(symbol, lot_index)
+                trades += 1
+            for _, buy_price, amount in (a for a in actions if a[0] == 'BUY'):
+                if amount > cash:
+                    skipped_buys += 1
+                    continue
+                cash -= amount
+                manager.add_lot(symbol, buy_price, amount / buy_price)
+                trades += 1
+            peak_capital_used = max(peak_capital_used, manager.total_basis)
+
+    final_equity = cash + manager.get_market_value(last_price) + sum(q * last_price[s] for s, q in leftover.items())
+    return {
+        'return_pct': (final_equity - capital) / capital * 100.0,
+        'max_drawdown_pct': max_drawdown,
+        'peak_capital_used': peak_capital_used,
+        'final_equity': final_equity,
+        'trades': trades,
+        'skipped_buys': skipped_buys,
+        'open_lots': manager.total_lots
+    }
+
+def _run_task(task):
+    group, symbols, params, capital = task
+    result = simulate(symbols, params, capital)
+    result.update(group=group, params=params)
+    return result
+
+# =============== GRID ===============
+def expand_grid(grid):
+    keys = [k for k in grid if k != 'groups']
+    for values in itertools.product(*(grid[k] for k in keys)):
+        yield dict(zip(keys, values))
+
+def resolve_groups(grid, symbols):
+    groups = grid.get('groups') or {"all": ["*"]}
+    resolved = {}
+    for name, patterns in groups.items():
+        members = [s for s in symbols if any(fnmatch.fnmatchcase(s, p) for p in patterns)]
+        if members:
+            resolved[name] = members
+    return resolved
+
+def run_sweep(series, grid, capital=10000.0, processes=None):
+    shm, layout = to_shared_memory(series)
+    try:
+        groups = resolve_groups(grid, list(series))
+        tasks = [(name, members, params, capital) for name, members in groups.items() for params in expand_grid(grid)]
+        with Pool(processes, initializer=_init_worker, initargs=(shm.name, layout)) as pool:
+            return list(pool.imap_unordered(_run_task, tasks, chunksize=max(1, len(tasks) // ((processes or os.cpu_count()) * 4))))
+    finally:
+        shm.close()
+        shm.unlink()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--prices", help="directory of <SYMBOL>.csv price series")
+    parser.add_argument("--synthetic", type=int, metavar="N", help="use N random-walk symbols instead of --prices")
+    parser.add_argument("--steps", type=int, default=1000, help="steps per synthetic series")
+    parser.add_argument("--grid", help="parameter grid JSON (defaults to a small built-in grid)")
+    parser.add_argument("--capital", type=float, default=10000.0)
+    parser.add_argument("--processes", type=int, default=None)
+    parser.add_argument("--sort", choices=sorted(SORT_KEYS), default="return")
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--output", help="write all results as JSON")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    if args.prices:
+        series = load_price_series(args.prices)
+    elif args.synthetic:
+        series = synthetic_series(args.synthetic, args.steps, args.seed)
+    else:
+        parser.error("one of --prices or --synthetic is required")
+
+    if args.grid:
+        with open(args.grid) as f:
+            grid = json.load(f)
+    else:
+        grid = {
+            "buy_drop_percent": [0.5, 1.0, 2.0],
+            "sell_rise_percent": [1.0, 2.0, 3.0],
+            "profit_mode": ["TAKE", "LEAVE"]
+        }
+
+    start = time.perf_counter()
+    results = run_sweep(series, grid, args.capital, args.processes)
+    elapsed = time.perf_counter() - start
+    results.sort(key=SORT_KEYS[args.sort])
+
+    print(f"{len(results)} runs over {len(series)} symbols in {elapsed:.2f}s")
+    print(f"{'group':10} {'return %':>9} {'max DD %':>9} {'peak used':>10} {'trades':>7} {'skipped':>7}  params")
+    for r in results[:args.top]:
+        print(f"{r['group']:10} {r['return_pct']:9.2f} {r['max_drawdown_pct']:9.2f} {r['peak_capital_used']:10.2f} "
+              f"{r['trades']:7} {r['skipped_buys']:7}  {json.dumps(r['params'])}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=4)
+
+if __name__ == "__main__":
+    main()
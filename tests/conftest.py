@@ -0,0 +1,64 @@
+import os
+import sys
+import json
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import bot
+
+class FakeAPI:
+    """
+    Stands in for AlpacaAPI in TradingBot.run_iteration: every symbol quotes at
+    prices.get(symbol, default_price), last trades come from trade_prices and
+    orders always succeed.
+    """
+    def __init__(self, prices=None, default_price=10.0, balances=(1000.0, 500.0), trade_prices=None):
+        self.prices = prices if prices is not None else {}
+        self.trade_prices = trade_prices or {}
+        self.default_price = default_price
+        self.balances = balances
+        self.calls = []
+
+    def is_market_open(self):
+        return True
+
+    def get_multiple_prices(self, symbols):
+        self.calls.append(('get_multiple_prices', list(symbols)))
+        return {s: self.prices.get(s, self.default_price) for s in symbols}
+
+    def get_multiple_trade_prices(self, symbols):
+        self.calls.append(('get_multiple_trade_prices', list(symbols)))
+        return {s: self.trade_prices[s] for s in symbols if s in self.trade_prices}
+
+    def get_current_price(self, symbol):
+        return self.prices.get(symbol, self.default_price)
+
+    def place_order(self, symbol, side, quantity, dry_run=True):
+        return {"id": "TEST"}
+
+    def get_account_balances(self):
+        self.calls.append(('get_account_balances',))
+        return self.balances
+
+@pytest.fixture
+def make_bot(tmp_path, monkeypatch):
+    """
+    Builds a TradingBot on a temp config file, in-memory lots and a FakeAPI.
+    """
+    def factory(config, api=None):
+        config_path = tmp_path / "config.json"
+        config_path.write_text(json.dumps(config))
+        monkeypatch.setattr(bot, "CONFIG_FILE", str(config_path))
+
+        trading_bot = bot.TradingBot.__new__(bot.TradingBot)
+        trading_bot.config = dict(config)
+        trading_bot._config_sig = None
+        trading_bot.batch_plan = bot.SymbolBatchPlan()
+        trading_bot.position_fetcher = None
+        trading_bot.history = None
+        trading_bot.manager = bot.ActiveLotsManager(filename=None)
+        trading_bot.api = api or FakeAPI()
+        return trading_bot
+    return factory
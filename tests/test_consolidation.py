@@ -0,0 +1,116 @@
+import random
+
+import pytest
+
+import snapshot
+from bot import ActiveLotsManager, check_grid_triggers, consolidate_lots, get_sell_quantity, merge_lots, price_span
+
+CONFIG = {
+    "buy_drop_percent": 1.0,
+    "sell_rise_percent": 2.0,
+    "always_on": True,
+    "always_on_amount": 1.0,
+    "trade_amount": 10.0,
+    "profit_mode": "TAKE"
+}
+
+def random_bucket(rng):
+    base = rng.uniform(1, 1000)
+    return [{'buy_price': base * (1 + rng.uniform(0, CONFIG['sell_rise_percent']) / 100),
+             'quantity': rng.uniform(0.001, 5), 'timestamp': float(i)} for i in range(rng.randint(2, 10))]
+
+def sells_at(lot, price):
+    manager = ActiveLotsManager(filename=None)
+    manager.replace_lots({"X": [lot]})
+    return any(action[0] == 'SELL' for action in check_grid_triggers("X", price, manager, CONFIG))
+
+def count_buys(consolidation, top, price, iterations=30):
+    manager = ActiveLotsManager(filename=None, consolidation=consolidation)
+    for _ in range(10):
+        manager.add_lot("X", top, 1.0)
+    buys = 0
+    for _ in range(iterations):
+        for _, buy_price, amount in (a for a in check_grid_triggers("X", price, manager, CONFIG) if a[0] == 'BUY'):
+            manager.add_lot("X", buy_price, amount / buy_price)
+            buys += 1
+    return buys
+
+@pytest.mark.parametrize("consolidation", [None, {"enabled": True, "bucket_percent": 2.0}])
+def test_flat_price_below_bucket_top_buys_once(consolidation):
+    # Lots at the top of a 2% bucket, price 1.8% lower but still inside the bucket
+    top = 1.02 ** 100 * 0.9999
+    assert count_buys(consolidation, top, top * 0.982) == 1
+
+def test_merged_lot_keeps_lowest_fill():
+    low = 1.02 ** 100 * 1.001
+    parts = [{'buy_price': low * k, 'quantity': 1.0, 'timestamp': 0.0} for k in (1.0, 1.005, 1.01)]
+    merged = merge_lots(parts[1:] + [merge_lots(parts[:2])])
+    assert merged['min_buy_price'] == low
+
+    manager = ActiveLotsManager(filename=None, consolidation={"enabled": True, "bucket_percent": 2.0})
+    for part in parts:
+        manager.add_lot("X", part['buy_price'], part['quantity'])
+    assert manager.get_lot_count("X") == 1
+    assert manager.get_lowest_buy_price("X") == low
+
+def test_sell_quantity_matches_parts_once_every_part_sells():
+    rng = random.Random(1)
+    rise = 1 + CONFIG['sell_rise_percent'] / 100
+    for _ in range(2000):
+        parts = random_bucket(rng)
+        merged = merge_lots(parts)
+        price = max(lot['buy_price'] for lot in parts) * rise * rng.uniform(1, 1.5)
+        for mode in ('TAKE', 'LEAVE'):
+            together = sum(get_sell_quantity(lot, price, mode) for lot in parts)
+            assert get_sell_quantity(merged, price, mode) == pytest.approx(together, rel=1e-12)
+
+@pytest.mark.parametrize("bucket_percent", [0.25, 0.5])
+def test_merged_sell_trigger_stays_within_bucket_of_each_part(bucket_percent):
+    rng = random.Random(2)
+    rise = 1 + CONFIG['sell_rise_percent'] / 100
+    for _ in range(1000):
+        base = rng.uniform(1, 1000)
+        parts = [{'buy_price': base * (1 + rng.uniform(0, 3 * bucket_percent) / 100),
+                  'quantity': rng.uniform(0.001, 5), 'timestamp': float(i)} for i in range(rng.randint(2, 10))]
+        lots = consolidate_lots(parts, bucket_percent=bucket_percent, max_lots=1)
+        assert sum(lot['quantity'] for lot in lots) == pytest.approx(sum(lot['quantity'] for lot in parts))
+        for lot in lots:
+            assert price_span([lot]) <= bucket_percent / 100 * (1 + 1e-9)
+            low, high = lot.get('min_buy_price', lot['buy_price']), lot.get('max_buy_price', lot['buy_price'])
+            trigger = lot['buy_price'] * rise
+            # Between the cheapest and dearest part's own triggers, so within the span of each
+            assert low * rise * (1 - 1e-12) <= trigger <= high * rise * (1 + 1e-12)
+            # Above every part's buy price, so LEAVE cannot sell more than the lot holds
+            assert trigger > high
+            assert sells_at(lot, trigger * (1 + 1e-9))
+            assert not sells_at(lot, trigger * (1 - 1e-6))
+
+def test_max_lots_never_merges_past_bucket():
+    lots = [{'buy_price': 100.0 * 1.01 ** k, 'quantity': 1.0, 'timestamp': float(k)} for k in range(5)]
+    assert consolidate_lots(lots, bucket_percent=0.5, max_lots=1) == lots
+
+def test_no_bucket_means_no_merging():
+    lots = [{'buy_price': 100.0, 'quantity': 1.0, 'timestamp': float(k)} for k in range(5)]
+    assert consolidate_lots(lots, bucket_percent=0.0, max_lots=1) == lots
+
+def test_policy_is_clamped_and_warned_once_per_config_change(make_bot, caplog):
+    config = dict(CONFIG, symbols=["X"], check_interval=60, currency="USD",
+                  stake_settings={"mode": "fixed", "fixed_amount": 10.0},
+                  consolidation={"enabled": True, "bucket_percent": 2.0})
+    trading_bot = make_bot(config)
+    with caplog.at_level("WARNING"):
+        for _ in range(3):
+            trading_bot.run_iteration()
+    assert trading_bot.manager.consolidation['bucket_percent'] == pytest.approx(0.5)
+    assert sum("Clamping" in r.getMessage() for r in caplog.records) == 1
+
+def test_consolidated_lots_survive_snapshot(tmp_path):
+    lots = {"X": consolidate_lots(random_bucket(random.Random(3)), bucket_percent=2.0, max_lots=1),
+            "Y": [{'buy_price': 5.0, 'quantity': 2.0, 'timestamp': 1.0}]}
+    path = str(tmp_path / "lots.snap")
+    snapshot.write_lots_snapshot(lots, path)
+
+    manager = ActiveLotsManager(filename=path)
+    assert manager.get_lots("X") == lots["X"]
+    assert manager.get_lots("Y") == lots["Y"]
+    assert manager.get_lowest_buy_price("X") == lots["X"][0]['min_buy_price']
@@ -0,0 +1,127 @@
+import pytest
+
+import history
+
+# Small rings so wraparound is cheap: 1 hour of minutes, 2 days of hours, 30 days of days
+LEVELS = ((60, 60), (3600, 48), (86400, 30))
+START = 1_700_000_000 // 86400 * 86400.0
+
+@pytest.fixture
+def store(tmp_path):
+    return history.HistoryStore(str(tmp_path / "history.bin"), writable=True, levels=LEVELS)
+
+def record_minutes(store, minutes, start=START):
+    for m in range(minutes):
+        t = start + m * 60
+        store.record(equity=float(m), cash=1.0, basis=2.0, market_value=3.0, timestamp=t)
+    return start + (minutes - 1) * 60
+
+def level_times(store, level):
+    _, capacity, head, count = store._level_header(level)
+    start = (head - count) % capacity
+    return [store._row(level, (start + k) % capacity)[0] for k in range(count)]
+
+def test_rings_wrap_and_keep_the_newest_samples(store):
+    now = record_minutes(store, 3 * 24 * 60)
+    minutes, hours, days = (level_times(store, i) for i in range(3))
+    assert len(minutes) == 60 and minutes[0] == now - 59 * 60 and minutes[-1] == now
+    assert len(hours) == 48 and hours[-1] == now
+    assert len(days) == 3
+    assert all(a < b for level in (minutes, hours, days) for a, b in zip(level, level[1:]))
+
+def test_same_bucket_keeps_the_newest_sample(store):
+    store.record(1.0, 1.0, 1.0, 1.0, timestamp=START + 10)
+    store.record(2.0, 1.0, 1.0, 1.0, timestamp=START + 50)
+    # Older than the last sample: ignored
+    store.record(3.0, 1.0, 1.0, 1.0, timestamp=START + 20)
+    for level in range(3):
+        assert store._level_header(level)[3] == 1
+    assert store.query(60, now=START + 60)[1] == [(START + 50, 2.0, 1.0, 1.0, 1.0)]
+
+    # Next minute is a new row at the minute level only
+    store.record(4.0, 1.0, 1.0, 1.0, timestamp=START + 70)
+    assert [store._level_header(i)[3] for i in range(3)] == [2, 1, 1]
+    assert store._row(1, 0)[1] == 4.0
+
+@pytest.mark.parametrize("seconds, resolution", [
+    (1800, 60),           # fits in the minute ring
+    (3600, 60),
+    (86400, 3600),        # needs the hour ring
+    (7 * 86400, 86400),   # needs the day ring
+    (None, 86400),        # everything comes from the coarsest ring
+])
+def test_query_picks_the_finest_covering_level(store, seconds, resolution):
+    now = record_minutes(store, 3 * 24 * 60)
+    got_resolution, rows = store.query(seconds, now=now)
+    assert got_resolution == resolution
+    assert rows[-1][0] == now
+    if seconds is not None:
+        # Binary search starts at the first sample inside the range
+        assert rows[0][0] >= now - seconds
+        level = [r for r, _ in LEVELS].index(resolution)
+        older = [t for t in level_times(store, level) if t < rows[0][0]]
+        assert not older or older[-1] < now - seconds
+
+def test_query_strides_to_max_points(store):
+    now = record_minutes(store, 60)
+    resolution, rows = store.query(3600, now=now, max_points=7)
+    # 60 rows in range, stride 9, anchored on the newest
+    assert resolution == 60 * 9
+    assert len(rows) == 7
+    assert rows[-1][0] == now
+    assert [b[0] - a[0] for a, b in zip(rows, rows[1:])] == [540.0] * 6
+
+    resolution, rows = store.query(3600, now=now, max_points=500)
+    assert resolution == 60 and len(rows) == 60
+
+def test_query_default_budget_bounds_every_range(tmp_path):
+    store = history.HistoryStore(str(tmp_path / "history.bin"), writable=True)
+    now = START + 14 * 86400
+    t = now - 14 * 86400
+    while t <= now:
+        store.record(1.0, 1.0, 1.0, 1.0, timestamp=t)
+        t += 60
+    for name, seconds in history.RANGES.items():
+        resolution, rows = store.query(seconds, now=now)
+        assert 0 < len(rows) <= history.MAX_POINTS, name
+        assert rows[-1][0] == now, name
+
+def test_empty_and_out_of_range_queries(store):
+    assert store.query(3600, now=START) == (60, [])
+    record_minutes(store, 5)
+    assert store.query(60, now=START + 86400)[1] == []
+
+def test_reader_sees_writer_and_rejects_other_layouts(store, tmp_path):
+    now = record_minutes(store, 10)
+    reader = history.HistoryStore(store.path, levels=LEVELS)
+    assert reader.query(3600, now=now) == store.query(3600, now=now)
+    with pytest.raises(ValueError):
+        history.HistoryStore(store.path, levels=LEVELS[:2])
+
+def history_bot(make_bot, tmp_path, api):
+    config = {"symbols": ["A"], "buy_drop_percent": 1.0, "sell_rise_percent": 2.0, "profit_mode": "TAKE",
+              "currency": "USD", "stake_settings": {"mode": "percent", "percent_amount": 1.0}}
+    trading_bot = make_bot(config, api=api)
+    trading_bot.history = history.HistoryStore(str(tmp_path / "history.bin"), writable=True, levels=LEVELS)
+    trading_bot.manager.replace_lots({
+        symbol: [{'buy_price': 10.0, 'quantity': 1.0, 'timestamp': 0.0}] for symbol in ("A", "OLD", "ZERO")
+    })
+    return trading_bot
+
+def test_record_prices_held_symbols_outside_the_config(make_bot, tmp_path):
+    from conftest import FakeAPI
+    api = FakeAPI(prices={"A": 10.1, "OLD": 30.0, "ZERO": 0.0}, trade_prices={"ZERO": 40.0})
+    trading_bot = history_bot(make_bot, tmp_path, api)
+    trading_bot.run_iteration()
+
+    _, rows = trading_bot.history.query(None)
+    assert rows[-1][1:] == (1000.0, 500.0, 30.0, pytest.approx(10.1 + 30.0 + 40.0))
+    # Balances fetched once for the percent stake and reused for the sample
+    assert sum(call[0] == 'get_account_balances' for call in api.calls) == 1
+
+def test_record_skips_sample_when_a_held_symbol_has_no_price(make_bot, tmp_path):
+    from conftest import FakeAPI
+    api = FakeAPI(prices={"A": 10.1, "OLD": 30.0, "ZERO": 0.0})
+    trading_bot = history_bot(make_bot, tmp_path, api)
+    trading_bot.run_iteration()
+    assert trading_bot.history.query(None)[1] == []
@@ -0,0 +1,52 @@
+import os
+import time
+
+import profiling
+
+def arm_in_fork(profiler, path):
+    """
+    Forks a worker that resets like web_ui's at-fork hook, polls the arm file and
+    reports through its exit code whether it armed.
+    """
+    pid = os.fork()
+    if pid == 0:
+        profiler.after_fork()
+        profiler.check_arm_file(path)
+        os._exit(1 if profiler.armed else 0)
+    _, status = os.waitpid(pid, 0)
+    return os.waitstatus_to_exitcode(status) == 1
+
+def test_arm_request_reaches_running_workers_but_not_later_ones(tmp_path):
+    path = str(tmp_path / "web.arm")
+    master = profiling.OnDemandProfiler("web", output_dir=str(tmp_path))
+    master.after_fork()
+    running = profiling.OnDemandProfiler("web", output_dir=str(tmp_path))
+
+    profiling.write_arm_request(path, 3)
+    running.check_arm_file(path)
+    assert running.armed
+
+    # A replacement worker forked after the request must not replay it
+    time.sleep(0.01)
+    assert not arm_in_fork(master, path)
+
+    # Requests made after a worker started do reach it
+    master.after_fork()
+    time.sleep(0.01)
+    profiling.write_arm_request(path, 2)
+    master.check_arm_file(path)
+    assert master.armed
+
+def test_arm_request_applies_once(tmp_path):
+    path = str(tmp_path / "web.arm")
+    profiler = profiling.OnDemandProfiler("web", output_dir=str(tmp_path))
+    profiling.write_arm_request(path, 1)
+    profiler.check_arm_file(path)
+    assert profiler.armed
+    profiler.stop(profiler.start(), "run")
+    assert not profiler.armed
+
+    profiler.check_arm_file(path)
+    assert not profiler.armed
+    sessions = [d for d in os.listdir(tmp_path) if d.startswith("web-")]
+    assert len(sessions) == 1 and sessions[0].endswith(f"-{os.getpid()}")
@@ -0,0 +1,114 @@
+import queue
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from bot import ActiveLotsManager, PositionFetcher, reconcile_lots
+
+def make_manager(holdings):
+    manager = ActiveLotsManager(filename=None)
+    manager.replace_lots({
+        symbol: [{'buy_price': price, 'quantity': qty, 'timestamp': 0.0} for price, qty in lots]
+        for symbol, lots in holdings.items()
+    })
+    manager.modified_at.clear()
+    return manager
+
+def positions(**quantities):
+    return {symbol: {'qty': qty, 'avg_entry_price': 1.0} for symbol, qty in quantities.items()}
+
+def test_within_tolerance_is_not_a_mismatch():
+    manager = make_manager({"A": [(10.0, 1.0)], "B": [(10.0, 1.0)]})
+    updates, mismatches = reconcile_lots(manager, positions(A=1.009, B=0.95), tolerance_percent=1.0, correct=True)
+    assert [m[0] for m in mismatches] == ["B"]
+    assert list(updates) == ["B"]
+
+def test_open_orders_and_recent_changes_are_skipped():
+    manager = make_manager({"A": [(10.0, 1.0)], "B": [(10.0, 1.0)], "C": [(10.0, 1.0)]})
+    fetched_at = time.time()
+    manager.modified_at["C"] = fetched_at + 1
+    manager.modified_at["B"] = fetched_at - 1
+    updates, mismatches = reconcile_lots(manager, positions(A=2.0, B=2.0, C=2.0, D=1.0),
+                                         open_order_symbols={"A", "D"}, since=fetched_at, correct=True)
+    assert [m[0] for m in mismatches] == ["B"]
+    assert list(updates) == ["B"]
+
+def test_correct_scales_and_drops_tracked_symbols():
+    manager = make_manager({"A": [(10.0, 1.0), (8.0, 3.0)], "B": [(5.0, 2.0)]})
+    updates, mismatches = reconcile_lots(manager, positions(A=2.0), correct=True)
+    assert sorted(mismatches) == [("A", 4.0, 2.0, "scaled"), ("B", 2.0, 0.0, "dropped")]
+    # Buy prices are kept, quantities scaled by broker / local
+    assert [(lot['buy_price'], lot['quantity']) for lot in updates["A"]] == [(10.0, 0.5), (8.0, 1.5)]
+    assert updates["B"] == []
+
+    manager.replace_lots(updates)
+    assert manager.symbol_stats["A"]["quantity"] == pytest.approx(2.0)
+    assert "B" not in manager.lots
+
+def test_flag_mode_changes_nothing():
+    manager = make_manager({"A": [(10.0, 1.0)], "B": [(5.0, 2.0)]})
+    updates, mismatches = reconcile_lots(manager, positions(A=3.0), correct=False)
+    assert updates == {}
+    assert sorted(m[3] for m in mismatches) == ["flagged", "flagged"]
+
+def test_untracked_positions_are_only_flagged():
+    manager = make_manager({})
+    updates, mismatches = reconcile_lots(manager, positions(X=4.0), correct=True)
+    assert updates == {}
+    assert mismatches == [("X", 0.0, 4.0, "untracked")]
+
+def test_leave_surplus_is_ignored_and_lots_never_scaled_up():
+    manager = make_manager({"A": [(10.0, 1.0)], "B": [(10.0, 2.0)]})
+    # A holds LEAVE profit shares, S was sold out with profit left behind, B is short
+    updates, mismatches = reconcile_lots(manager, positions(A=1.3, S=0.2, B=1.0), correct=True, profit_mode='LEAVE')
+    assert mismatches == [("B", 2.0, 1.0, "scaled")]
+    assert [lot['quantity'] for lot in updates["B"]] == [1.0]
+
+def test_apply_reconciliation_passes_profit_mode(make_bot):
+    config = {"symbols": [], "buy_drop_percent": 1.0, "sell_rise_percent": 2.0, "profit_mode": "LEAVE",
+              "reconcile": {"enabled": True, "mode": "correct", "tolerance_percent": 1.0}}
+    trading_bot = make_bot(config)
+    trading_bot.manager.replace_lots({"A": [{'buy_price': 10.0, 'quantity': 1.0, 'timestamp': 0.0}]})
+    results = queue.SimpleQueue()
+    results.put((time.time(), positions(A=1.5), set()))
+    trading_bot.position_fetcher = SimpleNamespace(results=results)
+
+    trading_bot._apply_reconciliation()
+    assert trading_bot.manager.get_lots("A")[0]['quantity'] == 1.0
+
+class PositionsAPI:
+    def __init__(self):
+        self.fetches = 0
+
+    def is_market_open(self):
+        return True
+
+    def get_open_order_symbols(self):
+        return set()
+
+    def get_all_positions(self):
+        self.fetches += 1
+        return positions(A=1.0)
+
+def test_fetcher_rereads_settings_every_tick(monkeypatch):
+    monkeypatch.setenv("TRADING_MODE", "PAPER")
+    settings = {"enabled": True, "interval": 100}
+    api = PositionsAPI()
+    fetcher = PositionFetcher(lambda: settings, api=api)
+    start = fetcher._last_run
+
+    assert not fetcher.tick(start + 50)
+    settings["interval"] = 30
+    assert fetcher.tick(start + 50)
+    assert fetcher.results.get_nowait()[1] == positions(A=1.0)
+
+    # Disabling takes effect on the next tick, even when a run is due
+    settings["enabled"] = False
+    assert not fetcher.tick(start + 1000)
+    assert api.fetches == 1
+
+def test_fetcher_skips_in_dry_mode(monkeypatch):
+    monkeypatch.setenv("TRADING_MODE", "DRY")
+    fetcher = PositionFetcher(lambda: {"enabled": True, "interval": 0}, api=PositionsAPI())
+    assert not fetcher.tick()
@@ -0,0 +1,113 @@
+import json
+import random
+
+import pytest
+
+import snapshot
+from bot import ActiveLotsManager
+
+def random_lots(seed, num_symbols=50, max_lots=6):
+    rng = random.Random(seed)
+    lots = {}
+    for i in range(num_symbols):
+        count = rng.randint(1, max_lots)
+        lots[f"S{i:03d}"] = [{'buy_price': rng.uniform(1, 500), 'quantity': rng.uniform(0.001, 3),
+                              'timestamp': rng.uniform(1.6e9, 1.7e9)} for _ in range(count)]
+    return lots
+
+def write_json(path, data):
+    with open(path, 'w') as f:
+        json.dump(data, f)
+
+def test_lots_round_trip_through_convert(tmp_path):
+    lots = random_lots(1)
+    src, snap, back = tmp_path / "lots.json", tmp_path / "lots.snap", tmp_path / "back.json"
+    write_json(src, lots)
+
+    snapshot.convert(str(src), str(snap))
+    reader = snapshot.LotsSnapshot(str(snap))
+    assert len(reader) == len(lots)
+    assert reader.num_lots == sum(len(v) for v in lots.values())
+    assert reader.symbols() == sorted(lots)
+    assert reader.get_lots("S007") == lots["S007"]
+    assert reader.get_lots("MISSING") == []
+    assert "S049" in reader and "S050" not in reader
+
+    snapshot.convert(str(snap), str(back))
+    with open(back) as f:
+        assert json.load(f) == lots
+
+def test_config_round_trip_through_convert(tmp_path):
+    config = {"symbols": ["AAPL", "BRK.B", "TSLA"], "buy_drop_percent": 1.0,
+              "stake_settings": {"mode": "fixed", "fixed_amount": 10.0}}
+    src, snap, back = tmp_path / "config.json", tmp_path / "config.snap", tmp_path / "back.json"
+    write_json(src, config)
+
+    snapshot.convert(str(src), str(snap))
+    assert snapshot.read_config_snapshot(str(snap)) == config
+    snapshot.convert(str(snap), str(back))
+    with open(back) as f:
+        assert json.load(f) == config
+
+def test_config_snapshot_without_symbols(tmp_path):
+    path = str(tmp_path / "config.snap")
+    snapshot.write_config_snapshot({"symbols": [], "currency": "USD"}, path)
+    assert snapshot.read_config_snapshot(path) == {"symbols": [], "currency": "USD"}
+
+def test_empty_lots_snapshot(tmp_path):
+    path = str(tmp_path / "lots.snap")
+    snapshot.write_lots_snapshot({}, path)
+    manager = ActiveLotsManager(filename=path)
+    assert manager.total_lots == 0 and manager.symbol_stats == {}
+
+def test_rejects_non_snapshot(tmp_path):
+    path = tmp_path / "lots.snap"
+    path.write_bytes(b"{}")
+    with pytest.raises(ValueError):
+        snapshot.LotsSnapshot(str(path))
+
+def test_stored_stats_match_rebuilt_aggregates(tmp_path):
+    lots = random_lots(2)
+    json_path, snap_path = str(tmp_path / "lots.json"), str(tmp_path / "lots.snap")
+    write_json(json_path, lots)
+    snapshot.write_lots_snapshot(lots, snap_path)
+
+    from_json = ActiveLotsManager(filename=json_path)
+    from_snap = ActiveLotsManager(filename=snap_path)
+    # Aggregates came from the snapshot header, not from decoding lots
+    assert from_snap.lots._cache == {}
+
+    assert from_snap.total_lots == from_json.total_lots
+    assert from_snap.total_basis == pytest.approx(from_json.total_basis)
+    assert from_snap.symbol_stats.keys() == from_json.symbol_stats.keys()
+    for symbol, stats in from_json.symbol_stats.items():
+        assert from_snap.symbol_stats[symbol] == pytest.approx(stats)
+
+def test_lazy_lots_edits_survive_save_and_reload(tmp_path):
+    lots = random_lots(3)
+    path = str(tmp_path / "lots.snap")
+    snapshot.write_lots_snapshot(lots, path)
+
+    manager = ActiveLotsManager(filename=path)
+    assert isinstance(manager.lots, snapshot.LazyLots)
+    manager.add_lot("S000", 12.5, 2.0)
+    manager.add_lot("NEW", 3.0, 1.5)
+    manager.remove_lot("S001", 0)
+    manager.replace_lots({"S002": []})
+    while manager.get_lots("S003"):
+        manager.remove_lot("S003", 0)
+
+    expected = {symbol: list(symbol_lots) for symbol, symbol_lots in lots.items()}
+    expected["S000"].append(manager.get_lots("S000")[-1])
+    expected["NEW"] = manager.get_lots("NEW")
+    expected["S001"].pop(0)
+    if not expected["S001"]:
+        del expected["S001"]
+    del expected["S002"], expected["S003"]
+
+    reloaded = ActiveLotsManager(filename=path)
+    assert reloaded.lots.keys() == expected.keys()
+    assert {symbol: reloaded.get_lots(symbol) for symbol in expected} == expected
+    assert reloaded.total_lots == manager.total_lots == sum(len(v) for v in expected.values())
+    assert reloaded.total_basis == pytest.approx(manager.total_basis)
+    assert reloaded.get_lowest_buy_price("NEW") == 3.0
@@ -0,0 +1,129 @@
+import json
+
+import pytest
+
+import web_ui
+from bot import SymbolBatchPlan
+
+UNIVERSE = ["AAPL", "AMD", "AMZN", "MSFT", "NVDA", "NVDL", "TSLA"]
+
+def check_plan(plan, symbols):
+    planned = [s for batch in plan.batches for s in batch]
+    assert sorted(planned) == sorted(set(symbols))
+    assert all(len(batch) <= plan.batch_size for batch in plan.batches)
+    assert all(symbol in plan.batches[i] for symbol, i in plan._batch_of.items())
+
+def test_batch_plan_moves_only_changed_symbols():
+    plan = SymbolBatchPlan(batch_size=3)
+    symbols = [f"S{i}" for i in range(7)]
+    assert plan.update(symbols) == (symbols, [])
+    assert plan.batches == [["S0", "S1", "S2"], ["S3", "S4", "S5"], ["S6"]]
+    assert plan.update(list(symbols)) == ([], [])
+
+    # Removals leave holes in place instead of re-slicing
+    symbols = [s for s in symbols if s not in ("S1", "S4")]
+    assert plan.update(symbols) == ([], ["S1", "S4"])
+    assert plan.batches == [["S0", "S2"], ["S3", "S5"], ["S6"]]
+
+    # Added back (and new) symbols go to the last batch
+    symbols += ["S1", "S7", "S8"]
+    assert plan.update(symbols) == (["S1", "S7", "S8"], [])
+    assert plan.batches == [["S0", "S2"], ["S3", "S5"], ["S6", "S1", "S7"], ["S8"]]
+    check_plan(plan, symbols)
+
+def test_batch_plan_ignores_duplicates():
+    plan = SymbolBatchPlan(batch_size=2)
+    added, _ = plan.update(["A", "B", "A", "C", "B"])
+    assert added == ["A", "B", "C"]
+    check_plan(plan, ["A", "B", "C"])
+
+def test_batch_plan_repacks_when_mostly_holes():
+    plan = SymbolBatchPlan(batch_size=10)
+    symbols = [f"S{i:03d}" for i in range(100)]
+    plan.update(symbols)
+    kept = symbols[::20]
+    assert plan.update(kept) == ([], [s for s in symbols if s not in kept])
+    assert plan.batches == [kept]
+    check_plan(plan, kept)
+
+class AssetsAPI:
+    def __init__(self, assets):
+        self.assets = assets
+        self.calls = 0
+
+    def get_tradeable_assets(self):
+        self.calls += 1
+        return list(self.assets)
+
+@pytest.fixture
+def app_state(tmp_path, monkeypatch):
+    config_path = tmp_path / "config.json"
+    config_path.write_text(json.dumps({"symbols": ["TSLA", "AAPL", "MSFT"], "currency": "USD"}))
+    monkeypatch.setattr(web_ui, "CONFIG_FILE", str(config_path))
+    state = web_ui.AppState()
+    state._api = AssetsAPI(UNIVERSE)
+    monkeypatch.setattr(web_ui, "state", state)
+    return state
+
+def saved_symbols():
+    with open(web_ui.CONFIG_FILE) as f:
+        return json.load(f)['symbols']
+
+def test_update_symbols_keeps_order_and_removes_before_adding(app_state):
+    added, removed = app_state.update_symbols(add=["NVDA", "TSLA", "NVDA"], remove=["AAPL", "TSLA", "GONE"])
+    # TSLA is removed first, then appended again
+    assert (added, removed) == (["NVDA", "TSLA"], ["AAPL", "TSLA"])
+    assert saved_symbols() == ["MSFT", "NVDA", "TSLA"]
+    assert app_state.get_config()['symbols'] == saved_symbols()
+
+    assert app_state.update_symbols(add=["MSFT"], remove=["GONE"]) == ([], [])
+    assert saved_symbols() == ["MSFT", "NVDA", "TSLA"]
+
+def test_update_symbols_picks_up_other_writers(app_state):
+    app_state.get_config()
+    # Another worker rewrites the file; its edit must not be lost
+    web_ui.save_full_config({"symbols": ["AMD"], "currency": "USD"})
+    app_state.update_symbols(add=["AAPL"])
+    assert saved_symbols() == ["AMD", "AAPL"]
+
+def post_symbols(body):
+    return web_ui.app.test_client().post('/api/symbols', json=body)
+
+def test_api_symbols_adds_patterns_and_removes(app_state):
+    response = post_symbols({"add": ["nvd*", "AMD"], "remove": ["T*"]})
+    assert response.status_code == 200
+    assert response.get_json() == {"added": ["AMD", "NVDA", "NVDL"], "removed": ["TSLA"], "count": 5}
+    assert saved_symbols() == ["AAPL", "MSFT", "AMD", "NVDA", "NVDL"]
+
+@pytest.mark.parametrize("body, invalid", [
+    ({"add": ["NEWONE"]}, ["NEWONE"]),
+    ({"add": ["ZZ*"]}, ["ZZ*"]),
+    ({"add": ["AMD", "bad symbol!"]}, ["BAD SYMBOL!"]),
+    ({"add": ["AMD", 5]}, [5]),
+])
+def test_api_symbols_rejects_the_whole_request(app_state, body, invalid):
+    response = post_symbols(body)
+    assert response.status_code == 400
+    assert response.get_json()['invalid'] == invalid
+    assert saved_symbols() == ["TSLA", "AAPL", "MSFT"]
+
+def test_api_symbols_fails_when_assets_unavailable(app_state):
+    app_state._api.assets = []
+    response = post_symbols({"add": ["AM*"]})
+    assert response.status_code == 503
+    assert saved_symbols() == ["TSLA", "AAPL", "MSFT"]
+
+    # Removals do not need the asset list
+    response = post_symbols({"remove": ["AAPL"]})
+    assert response.status_code == 200
+    assert saved_symbols() == ["TSLA", "MSFT"]
+
+def test_api_symbols_caches_assets(app_state):
+    post_symbols({"add": ["AMD"]})
+    post_symbols({"add": ["AMZN"]})
+    assert app_state._api.calls == 1
+
+@pytest.mark.parametrize("body", [None, [], {"add": "AAPL"}])
+def test_api_symbols_rejects_malformed_bodies(app_state, body):
+    response = web_ui.app.test_client().post('/api/symbols', data=json.dumps(body), content_type='application/json')
+    assert response.status_code == 400
@@ -1,23 +1,169 @@
 import os
+import re
+import time
+import copy
+import hmac
 import json
-from flask import Flask, render_template_string, redirect, url_for, request, flash, jsonify
-from bot import ActiveLotsManager, AlpacaAPI
+import fcntl
+import fnmatch
+import threading
+from contextlib import contextmanager
+from flask import Flask, render_template_string, redirect, url_for, request, flash, jsonify, g
+import snapshot
+import profiling
+import history
+from bot import ActiveLotsManager, AlpacaAPI, CONFIG_FILE, LOTS_FILE, file_signature
 
 app = Flask(__name__)
 app.secret_key = os.urandom(24)
 
-api = AlpacaAPI()
-
 def load_full_config():
     try:
-        with open('config.json', 'r') as f:
+        if snapshot.is_snapshot(CONFIG_FILE):
+            return snapshot.read_config_snapshot(CONFIG_FILE)
+        with open(CONFIG_FILE, 'r') as f:
             return json.load(f)
     except:
         return {}
 
 def save_full_config(config):
-    with open('config.json', 'w') as f:
-        json.dump(config, f, indent=4)
+    if snapshot.is_snapshot(CONFIG_FILE):
+        snapshot.write_config_snapshot(config, CONFIG_FILE)
+        return
+    snapshot.atomic_write(CONFIG_FILE, [json.dumps(config, indent=4).encode()])
+
+# How long the tradeable asset list is reused when validating symbols
+ASSETS_TTL = 3600
+
+class AppState:
+    """
+    Process-wide cache of parsed config and lots, reloaded only when the files
+    change on disk. Warmed at import so gunicorn --preload workers share it
+    copy-on-write; the Alpaca client is built lazily in each worker.
+    """
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._config = None
+        self._config_sig = None
+        self._symbol_set = set()
+        self._manager = None
+        self._lots_sig = None
+        self._api = None
+        self._history = None
+        self._assets = None
+        self._assets_at = 0.0
+
+    @property
+    def api(self):
+        if self._api is None:
+            with self._lock:
+                if self._api is None:
+                    self._api = AlpacaAPI()
+        return self._api
+
+    def get_config(self):
+        """
+        Shared parsed config. Treat as read-only; use edit_config to change it.
+        """
+        sig = file_signature(CONFIG_FILE)
+        if self._config is None or sig != self._config_sig:
+            with self._lock:
+                if self._config is None or sig != self._config_sig:
+                    self._set_config(load_full_config(), sig)
+        return self._config
+
+    def _set_config(self, config, sig):
+        self._config = config
+        self._config_sig = sig
+        self._symbol_set = set(config.get('symbols', []))
+
+    @contextmanager
+    def _config_write_lock(self):
+        """
+        Serialises config read-modify-write across threads and gunicorn workers,
+        using flock on a sidecar lock file next to the config.
+        """
+        with self._lock, open(f"{CONFIG_FILE}.lock", 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    @contextmanager
+    def edit_config(self):
+        """
+        Yields a private copy of the config and writes it back atomically if it changed.
+        """
+        with self._config_write_lock():
+            # Re-checked under the lock, so another worker's write is picked up first
+            current = self.get_config()
+            config = copy.deepcopy(current)
+            yield config
+            if config != current:
+                save_full_config(config)
+                self._set_config(config, file_signature(CONFIG_FILE))
+
+    def update_symbols(self, add=(), remove=()):
+        """
+        Removes then appends symbols in one atomic write, keeping the existing order.
+        Membership checks use the in-memory symbol set. Returns (added, removed).
+        """
+        with self._config_write_lock():
+            config = self.get_config()
+            removed = [s for s in dict.fromkeys(remove) if s in self._symbol_set]
+            removed_set = set(removed)
+            present = self._symbol_set - removed_set
+            added = [s for s in dict.fromkeys(add) if s not in present]
+            if not added and not removed:
+                return [], []
+
+            kept = [s for s in config.get('symbols', []) if s not in removed_set] if removed else list(config.get('symbols', []))
+            new_config = dict(config, symbols=kept + added)
+            save_full_config(new_config)
+            self._config = new_config
+            self._config_sig = file_signature(CONFIG_FILE)
+            self._symbol_set = present.union(added)
+            return added, removed
+
+    def get_tradeable_assets(self):
+        """
+        Tradeable symbols, cached for ASSETS_TTL seconds. A failed refresh keeps the
+        previous list; [] only if the assets have never been fetched.
+        """
+        if self._assets is None or time.time() - self._assets_at > ASSETS_TTL:
+            assets = self.api.get_tradeable_assets()
+            if assets:
+                self._assets, self._assets_at = assets, time.time()
+        return self._assets or []
+
+    def get_manager(self):
+        sig = file_signature(LOTS_FILE)
+        if self._manager is None or sig != self._lots_sig:
+            with self._lock:
+                if self._manager is None or sig != self._lots_sig:
+                    self._manager = ActiveLotsManager()
+                    self._lots_sig = sig
+        return self._manager
+
+    def get_history(self):
+        """
+        Read-only view of the bot's history file, opened once it exists.
+        """
+        if self._history is None and os.path.exists(history.HISTORY_FILE):
+            with self._lock:
+                if self._history is None:
+                    self._history = history.HistoryStore()
+        return self._history
+
+    def clear_lots(self):
+        with self._lock:
+            self.get_manager().clear()
+            self._lots_sig = file_signature(LOTS_FILE)
+
+state = AppState()
+state.get_config()
+state.get_manager()
 
 HTML_TEMPLATE = """
 <!DOCTYPE html>
@@ -230,6 +376,20 @@ HTML_TEMPLATE = """
 
             <!-- Right: Live Monitor -->
             <div class="col-lg-8">
+                <div class="card">
+                    <div class="card-header d-flex justify-content-between align-items-center">
+                        <span><i class="fas fa-chart-line me-2"></i>Equity History</span>
+                        <div class="btn-group btn-group-sm" id="history-ranges">
+                            {% for r in ['1d', '7d', '30d', '1y', 'all'] %}
+                            <button type="button" class="btn btn-outline-secondary{{ ' active' if r == '1d' }}" data-range="{{ r }}">{{ r }}</button>
+                            {% endfor %}
+                        </div>
+                    </div>
+                    <div class="card-body">
+                        <canvas id="historyChart" height="120"></canvas>
+                    </div>
+                </div>
+
                 <div class="card">
                     <div class="card-header d-flex justify-content-between">
                         <span><i class="fas fa-wave-square me-2"></i>Execution Monitor</span>
@@ -261,11 +421,107 @@ HTML_TEMPLATE = """
 
     <script>
         let allocationChart = null;
+        let historyChart = null;
+        let historyRange = '1d';
+
+        async function updateHistory() {
+            try {
+                const response = await fetch('/api/history?range=' + historyRange);
+                const data = await response.json();
+                const labels = data.points.map(p => new Date(p[0] * 1000).toLocaleString());
+                const datasets = [
+                    { label: 'Equity', data: data.points.map(p => p[1]), borderColor: '#00d2ff', pointRadius: 0, borderWidth: 2 },
+                    { label: 'Market Value', data: data.points.map(p => p[4]), borderColor: '#00ff88', pointRadius: 0, borderWidth: 1 },
+                    { label: 'Invested', data: data.points.map(p => p[3]), borderColor: '#ffc107', pointRadius: 0, borderWidth: 1 }
+                ];
+                if (!historyChart) {
+                    const ctx = document.getElementById('historyChart').getContext('2d');
+                    historyChart = new Chart(ctx, {
+                        type: 'line',
+                        data: { labels: labels, datasets: datasets },
+                        options: {
+                            animation: false,
+                            plugins: { legend: { labels: { color: '#e0e0e0' } } },
+                            scales: { x: { ticks: { display: false } } }
+                        }
+                    });
+                } else {
+                    historyChart.data.labels = labels;
+                    historyChart.data.datasets = datasets;
+                    historyChart.update();
+                }
+            } catch (e) {
+                console.error("History Update Failed:", e);
+            }
+        }
+
+        document.querySelectorAll('#history-ranges button').forEach(btn => {
+            btn.addEventListener('click', () => {
+                document.querySelectorAll('#history-ranges button').forEach(b => b.classList.remove('active'));
+                btn.classList.add('active');
+                historyRange = btn.dataset.range;
+                updateHistory();
+            });
+        });
+
+        const expandedSymbols = new Set();
+        let lastPrices = {};
+
+        function toggleLots(symbol) {
+            if (expandedSymbols.has(symbol)) {
+                expandedSymbols.delete(symbol);
+                document.getElementById('lots-' + symbol).innerHTML = '';
+            } else {
+                expandedSymbols.add(symbol);
+                loadLots(symbol, lastPrices[symbol] || 0);
+            }
+        }
+
+        async function loadLots(symbol, currentPrice) {
+            const response = await fetch('/api/lots/' + encodeURIComponent(symbol));
+            const data = await response.json();
+            const target = document.getElementById('lots-' + symbol);
+            if (!target) return;
+            let html = '';
+            data.lots.forEach(lot => {
+                const profitPct = ((currentPrice - lot.buy_price) / lot.buy_price * 100);
+                const targetPct = 2.0; // Hardcoded sell target for UI ref
+                const progress = Math.min(Math.max((profitPct / targetPct) * 100, 0), 100);
+
+                html += `<div class="lot-item">
+                            <div class="d-flex justify-content-between align-items-center mb-1">
+                                <div>
+                                    <div class="small text-muted">Shares</div>
+                                    <div class="fw-bold highlight-value">${lot.quantity.toFixed(6)}</div>
+                                </div>
+                                <div>
+                                    <div class="small text-muted">Basis</div>
+                                    <div class="fw-bold highlight-value">$${(lot.quantity * lot.buy_price).toFixed(2)}</div>
+                                </div>
+                                <div class="text-end">
+                                    <div class="small text-muted">Return</div>
+                                    <div class="fw-bold" style="color: ${profitPct >= 0 ? 'var(--success)' : 'var(--danger)'}">
+                                        ${profitPct >= 0 ? '+' : ''}${profitPct.toFixed(2)}%
+                                    </div>
+                                </div>
+                            </div>
+                            <div class="progress">
+                                <div class="progress-bar" role="progressbar" style="width: ${progress}%"></div>
+                            </div>
+                            <div class="d-flex justify-content-between mt-1">
+                                <span style="font-size: 0.65rem" class="text-muted">PURCHASE</span>
+                                <span style="font-size: 0.65rem" class="text-muted">TAKE PROFIT (2%)</span>
+                            </div>
+                        </div>`;
+            });
+            target.innerHTML = html;
+        }
 
         async function updateDashboard() {
             try {
                 const response = await fetch('/api/data');
                 const data = await response.json();
+                lastPrices = data.prices;
                 
                 // Update Portfolio Pulse
                 document.getElementById('account-equity').innerText = '$' + data.equity.toFixed(2);
@@ -279,7 +535,7 @@ HTML_TEMPLATE = """
                 plElement.innerText = (pl >= 0 ? '+' : '') + '$' + pl.toFixed(2) + ' (' + plPercent.toFixed(2) + '%)';
                 plElement.style.color = pl >= 0 ? 'var(--success)' : 'var(--danger)';
                 
-                document.getElementById('active-count').innerText = Object.keys(data.lots).length;
+                document.getElementById('active-count').innerText = Object.keys(data.symbols).length;
 
                 // Update Chart
                 const chartLabels = Object.keys(data.allocation);
@@ -308,33 +564,34 @@ HTML_TEMPLATE = """
                     allocationChart.update();
                 }
 
-                // Update Lots Container
+                // Update Lots Container: one summary row per symbol, lots fetched when expanded
                 const container = document.getElementById('lots-container');
-                if (Object.keys(data.lots).length === 0) {
+                if (Object.keys(data.symbols).length === 0) {
                     container.innerHTML = '<div class="text-center py-5 text-muted">No active positions tracked</div>';
                 } else {
                     let html = '';
-                    for (const [symbol, lots] of Object.entries(data.lots)) {
+                    for (const [symbol, stats] of Object.entries(data.symbols)) {
                         const currentPrice = data.prices[symbol] || 0;
+                        const avgPrice = stats.cost_basis / stats.quantity;
+                        const profitPct = ((currentPrice - avgPrice) / avgPrice * 100);
                         html += `<div class="mb-4">
                                     <div class="d-flex justify-content-between align-items-end mb-2">
                                         <h6 class="m-0"><span class="badge bg-primary me-2">${symbol}</span> <span class="text-white">$${currentPrice.toFixed(2)}</span></h6>
-                                    </div>`;
-                        
-                        lots.forEach(lot => {
-                            const profitPct = ((currentPrice - lot.buy_price) / lot.buy_price * 100);
-                            const targetPct = 2.0; // Hardcoded sell target for UI ref
-                            const progress = Math.min(Math.max((profitPct / targetPct) * 100, 0), 100);
-                            
-                            html += `<div class="lot-item">
-                                        <div class="d-flex justify-content-between align-items-center mb-1">
+                                        <button class="btn btn-sm btn-outline-light py-0" onclick="toggleLots('${symbol}')">${stats.lot_count} lots</button>
+                                    </div>
+                                    <div class="lot-item">
+                                        <div class="d-flex justify-content-between align-items-center">
                                             <div>
                                                 <div class="small text-muted">Shares</div>
-                                                <div class="fw-bold highlight-value">${lot.quantity.toFixed(6)}</div>
+                                                <div class="fw-bold highlight-value">${stats.quantity.toFixed(6)}</div>
                                             </div>
                                             <div>
                                                 <div class="small text-muted">Basis</div>
-                                                <div class="fw-bold highlight-value">$${(lot.quantity * lot.buy_price).toFixed(2)}</div>
+                                                <div class="fw-bold highlight-value">$${stats.cost_basis.toFixed(2)}</div>
+                                            </div>
+                                            <div>
+                                                <div class="small text-muted">Lowest Buy</div>
+                                                <div class="fw-bold highlight-value">$${stats.lowest_buy.toFixed(2)}</div>
                                             </div>
                                             <div class="text-end">
                                                 <div class="small text-muted">Return</div>
@@ -343,18 +600,12 @@ HTML_TEMPLATE = """
                                                 </div>
                                             </div>
                                         </div>
-                                        <div class="progress">
-                                            <div class="progress-bar" role="progressbar" style="width: ${progress}%"></div>
-                                        </div>
-                                        <div class="d-flex justify-content-between mt-1">
-                                            <span style="font-size: 0.65rem" class="text-muted">PURCHASE</span>
-                                            <span style="font-size: 0.65rem" class="text-muted">TAKE PROFIT (2%)</span>
-                                        </div>
-                                    </div>`;
-                        });
-                        html += `</div>`;
+                                    </div>
+                                    <div id="lots-${symbol}"></div>
+                                </div>`;
                     }
                     container.innerHTML = html;
+                    expandedSymbols.forEach(symbol => loadLots(symbol, data.prices[symbol] || 0));
                 }
 
             } catch (e) {
@@ -365,49 +616,77 @@ HTML_TEMPLATE = """
         // Start updates
         updateDashboard();
         setInterval(updateDashboard, 30000);
+        updateHistory();
+        setInterval(updateHistory, 60000);
     </script>
 </body>
 </html>
 """
 
+# Profile the next N requests on PROFILE_REQUESTS=N or POST /admin/profile
+profiler = profiling.OnDemandProfiler("web")
+PROFILE_ARM_FILE = os.path.join(profiling.PROFILE_DIR, "web.arm")
+_profiler_pid = None
+# Workers forked later (timeouts, max_requests) must not replay earlier arm requests
+os.register_at_fork(after_in_child=profiler.after_fork)
+
+@app.before_request
+def start_profile():
+    global _profiler_pid
+    if _profiler_pid != os.getpid():
+        # Armed after the gunicorn --preload fork, so each worker profiles its own first N requests
+        _profiler_pid = os.getpid()
+        profiling.arm_from_env(profiler, "PROFILE_REQUESTS")
+    profiler.check_arm_file(PROFILE_ARM_FILE)
+    if profiler.armed and request.endpoint != 'admin_profile':
+        g.profile_handle = profiler.start()
+
+@app.teardown_request
+def stop_profile(_exc):
+    handle = g.pop('profile_handle', None)
+    if handle:
+        profiler.stop(handle, f"{request.method} {request.path}")
+
+@app.route('/admin/profile', methods=['POST'])
+def admin_profile():
+    """
+    Arms request profiling in every worker. Disabled unless ADMIN_TOKEN is set; pass it as X-Admin-Token.
+    """
+    token = os.getenv("ADMIN_TOKEN")
+    if not token or not hmac.compare_digest(request.headers.get('X-Admin-Token', '').encode(), token.encode()):
+        return jsonify({"error": "forbidden"}), 403
+    count = request.args.get('count', 10, type=int)
+    memory = request.args.get('memory', '0') == '1'
+    profiling.write_arm_request(PROFILE_ARM_FILE, count, memory=memory)
+    # Each worker writes its own <name>-<timestamp>-<pid> session directory
+    return jsonify({"armed": count, "memory": memory, "output_dir": profiler.output_dir})
+
 @app.route('/')
 def index():
-    config = load_full_config()
-    market_open = api.is_market_open()
+    config = state.get_config()
+    market_open = state.api.is_market_open()
     trading_mode = os.getenv("TRADING_MODE", "DRY")
     return render_template_string(HTML_TEMPLATE, config=config, market_open=market_open, trading_mode=trading_mode)
 
 @app.route('/api/data')
 def get_data():
-    manager = ActiveLotsManager()
-    lots = manager.lots
-    symbols = list(lots.keys())
+    manager = state.get_manager()
+    # Per-symbol aggregates only, so the payload is O(symbols); lots come from /api/lots/<symbol>
+    symbols = list(manager.symbol_stats)
     
     # Batch fetch prices
-    prices = api.get_multiple_prices(symbols)
+    prices = state.api.get_multiple_prices(symbols)
     
     # Get account balance and equity
-    equity = api.get_account_equity() or 0
-    cash = api.get_account_cash() or 0
+    equity = state.api.get_account_equity() or 0
+    cash = state.api.get_account_cash() or 0
     
-    total_basis = 0
-    market_value = 0
-    allocation = {}
-    
-    for symbol, lot_list in lots.items():
-        sym_basis = 0
-        current_p = prices.get(symbol, 0)
-        
-        for lot in lot_list:
-            b = lot['quantity'] * lot['buy_price']
-            total_basis += b
-            sym_basis += b
-            market_value += lot['quantity'] * current_p
-            
-        allocation[symbol] = sym_basis
+    total_basis = manager.total_basis
+    market_value = manager.get_market_value(prices)
+    allocation = manager.get_allocation()
 
     return jsonify({
-        "lots": lots,
+        "symbols": manager.symbol_stats,
         "prices": prices,
         "total_basis": total_basis,
         "market_value": market_value,
@@ -416,24 +695,44 @@ def get_data():
         "allocation": allocation
     })
 
+@app.route('/api/lots/<symbol>')
+def get_symbol_lots(symbol):
+    """
+    Lots for one symbol; with a snapshot lots file only that symbol is decoded.
+    """
+    return jsonify({"symbol": symbol, "lots": state.get_manager().get_lots(symbol)})
+
+@app.route('/api/history')
+def get_history():
+    range_name = request.args.get('range', '1d')
+    if range_name not in history.RANGES:
+        return jsonify({"error": f"range must be one of {', '.join(history.RANGES)}"}), 400
+    store = state.get_history()
+    if store is None:
+        return jsonify({"range": range_name, "resolution": None, "fields": history.FIELDS, "points": []})
+    resolution, points = store.query(history.RANGES[range_name])
+    return jsonify({"range": range_name, "resolution": resolution, "fields": history.FIELDS, "points": points})
+
 @app.route('/add-symbol', methods=['POST'])
 def add_symbol():
     symbol = request.form.get('symbol', '').upper().strip()
     if symbol:
-        config = load_full_config()
-        if symbol not in config['symbols']:
-            config['symbols'].append(symbol)
-            save_full_config(config)
-            flash(f"Ticker {symbol} added to terminal.")
+        universe = state.get_tradeable_assets()
+        if not universe:
+            flash("Could not fetch tradeable assets to verify the ticker. Try again later.")
+        elif symbol not in universe:
+            flash(f"{symbol} is not a tradeable asset.")
+        else:
+            added, _ = state.update_symbols(add=[symbol])
+            if added:
+                flash(f"Ticker {symbol} added to terminal.")
     return redirect(url_for('index'))
 
 @app.route('/add-all-symbols', methods=['POST'])
 def add_all_symbols():
-    symbols = api.get_tradeable_assets()
+    symbols = state.get_tradeable_assets()
     if symbols:
-        config = load_full_config()
-        config['symbols'] = list(set(config['symbols'] + symbols))
-        save_full_config(config)
+        state.update_symbols(add=symbols)
         flash(f"Imported {len(symbols)} assets.")
     return redirect(url_for('index'))
 
@@ -441,34 +740,92 @@ def add_all_symbols():
 def remove_symbol():
     symbol = request.form.get('symbol')
     if symbol:
-        config = load_full_config()
-        if symbol in config['symbols']:
-            config['symbols'].remove(symbol)
-            save_full_config(config)
+        _, removed = state.update_symbols(remove=[symbol])
+        if removed:
             flash(f"Removed {symbol}.")
     return redirect(url_for('index'))
 
+SYMBOL_RE = re.compile(r'^[A-Z][A-Z0-9./-]{0,11}$')
+PATTERN_CHARS = set('*?[')
+
+def _expand_entries(entries, universe, strict=False):
+    """
+    Splits request entries into symbols and glob patterns (e.g. "AA*", "SPY?"),
+    expanding patterns against universe. With strict, plain symbols must be in
+    universe and patterns must match something. Returns (symbols, invalid).
+    """
+    members = set(universe) if strict else None
+    symbols, invalid, patterns = [], [], []
+    for entry in entries:
+        if not isinstance(entry, str):
+            invalid.append(entry)
+            continue
+        entry = entry.upper().strip()
+        if PATTERN_CHARS.intersection(entry):
+            patterns.append(entry)
+        elif SYMBOL_RE.match(entry) and (members is None or entry in members):
+            symbols.append(entry)
+        else:
+            invalid.append(entry)
+    for pattern in patterns:
+        matches = [s for s in universe if fnmatch.fnmatchcase(s, pattern)]
+        if strict and not matches:
+            invalid.append(pattern)
+        symbols.extend(matches)
+    return symbols, invalid
+
+@app.route('/api/symbols', methods=['POST'])
+def bulk_symbols():
+    """
+    Adds and removes many symbols in one validated, atomic config write.
+    Body: {"add": ["AAPL", "NV*"], "remove": ["TSLA", "CS?"]}. Added symbols and
+    patterns must match tradeable assets; remove patterns match the current symbol list.
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({"error": "expected a JSON object with 'add' and/or 'remove' lists"}), 400
+    add_entries = data.get('add', [])
+    remove_entries = data.get('remove', [])
+    if not isinstance(add_entries, list) or not isinstance(remove_entries, list):
+        return jsonify({"error": "'add' and 'remove' must be lists"}), 400
+
+    universe = []
+    if add_entries:
+        universe = state.get_tradeable_assets()
+        if not universe:
+            return jsonify({"error": "could not fetch tradeable assets"}), 503
+
+    to_add, invalid_add = _expand_entries(add_entries, universe, strict=True)
+    to_remove, invalid_remove = _expand_entries(remove_entries, state.get_config().get('symbols', []))
+    if invalid_add or invalid_remove:
+        return jsonify({"error": "invalid symbols", "invalid": invalid_add + invalid_remove}), 400
+
+    added, removed = state.update_symbols(add=to_add, remove=to_remove)
+    return jsonify({
+        "added": added,
+        "removed": removed,
+        "count": len(state.get_config().get('symbols', []))
+    })
+
 @app.route('/update-stake', methods=['POST'])
 def update_stake():
-    config = load_full_config()
-    config['stake_settings']['mode'] = request.form.get('mode')
-    config['stake_settings']['fixed_amount'] = float(request.form.get('fixed_amount', 10.0))
-    config['stake_settings']['percent_amount'] = float(request.form.get('percent_amount', 1.0))
-    save_full_config(config)
+    with state.edit_config() as config:
+        config['stake_settings']['mode'] = request.form.get('mode')
+        config['stake_settings']['fixed_amount'] = float(request.form.get('fixed_amount', 10.0))
+        config['stake_settings']['percent_amount'] = float(request.form.get('percent_amount', 1.0))
     flash("Staking parameters synchronized.")
     return redirect(url_for('index'))
 
 @app.route('/cancel-orders', methods=['POST'])
 def cancel_orders():
-    api.cancel_all_orders()
+    state.api.cancel_all_orders()
     flash("All pending orders purged.")
     return redirect(url_for('index'))
 
 @app.route('/close-positions', methods=['POST'])
 def close_positions():
-    api.close_all_positions()
-    with open('lots.json', 'w') as f:
-        json.dump({}, f)
+    state.api.close_all_positions()
+    state.clear_lots()
     flash("Portfolio liquidated and local state reset.")
     return redirect(url_for('index'))
 